@@ -0,0 +1,287 @@
+"""End-to-end benchmark of the label pipeline, stage by stage
+
+Generates synthetic nutrition-label images with PIL and times each stage
+separately: preprocess_image, extract_text_from_image (skipped when
+PaddleOCR is not installed), the row grouping in utils.layout,
+clean_nutrition_text and analyze_text against a mocked inference endpoint.
+Skipped stages are listed under "missing" in a saved baseline, with the
+reason, so a baseline without OCR numbers says so.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --save-baseline benchmarks/baseline.json
+    python -m benchmarks.bench_pipeline --compare benchmarks/baseline.json --fail-on-regression
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import logging
+import os
+import platform
+import random
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+from utils import analysis, resilience
+from utils.image_processing import preprocess_image, extract_text_from_image
+from utils.layout import boxes_to_array, format_rows
+from utils.text_cleaning import clean_nutrition_text
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# (label, amount, %DV) rows drawn on every synthetic label
+LABEL_ROWS = [
+    ("Calories", "230", ""),
+    ("Total Fat", "8g", "10%"),
+    ("Saturated Fat", "1g", "5%"),
+    ("Trans Fat", "0g", ""),
+    ("Cholesterol", "0mg", "0%"),
+    ("Sodium", "160mg", "7%"),
+    ("Total Carbohydrate", "37g", "13%"),
+    ("Dietary Fiber", "4g", "14%"),
+    ("Total Sugars", "12g", ""),
+    ("Includes 10g Added Sugars", "", "20%"),
+    ("Protein", "3g", ""),
+    ("Vitamin D", "2mcg", "10%"),
+    ("Calcium", "260mg", "20%"),
+    ("Iron", "8mg", "45%"),
+    ("Potassium", "235mg", "6%"),
+]
+
+RESOLUTIONS = {
+    "small": (800, 600),
+    "medium": (2000, 1500),
+    "large": (4032, 3024),  # 12 MP phone photo
+}
+NOISE_LEVELS = {"clean": 0.0, "noisy": 12.0}
+
+
+def make_label(size, noise, seed=0):
+    """Draw a package photo with a ruled nutrition panel
+
+    Returns the image and OCR-style lines ([quad, (text, confidence)]) for the
+    drawn text, so the layout stage can be timed without running OCR.
+    """
+    rng = random.Random(seed)
+    width, height = size
+    image = Image.new('RGB', size, (214, 190, 150))
+    draw = ImageDraw.Draw(image)
+
+    # Some package artwork around the panel
+    for _ in range(6):
+        x, y = rng.randrange(width), rng.randrange(height)
+        draw.ellipse((x, y, x + width // 6, y + height // 6), fill=(rng.randrange(255), 90, 60))
+
+    scale = width / 1000
+    left, top = int(width * 0.45), int(height * 0.1)
+    right, line_height = int(width * 0.95), int(40 * scale)
+    draw.rectangle((left, top, right, top + line_height * (len(LABEL_ROWS) + 3)), fill='white', outline='black', width=max(2, int(3 * scale)))
+
+    lines = []
+
+    def text(x, y, value):
+        draw.text((x, y), value, fill='black')
+        text_width = max(1, int(len(value) * 6 * scale))
+        quad = [[x, y], [x + text_width, y], [x + text_width, y + line_height * 0.6], [x, y + line_height * 0.6]]
+        lines.append([quad, (value, 0.9 + rng.random() * 0.1)])
+
+    text(left + 10 * scale, top + 10 * scale, "Nutrition Facts")
+    text(left + 10 * scale, top + line_height, "Serving Size 2/3 cup (55g)")
+    y = top + 2 * line_height
+    for name, amount, daily_value in LABEL_ROWS:
+        draw.line((left + 5, y, right - 5, y), fill='black', width=max(1, int(2 * scale)))
+        row_y = y + line_height * 0.2 + rng.uniform(-2, 2) * scale
+        text(left + 10 * scale, row_y, name)
+        if amount:
+            text(left + (right - left) * 0.55, row_y, amount)
+        if daily_value:
+            text(right - 60 * scale, row_y, daily_value)
+        y += line_height
+
+    if noise:
+        pixels = np.asarray(image, dtype=np.float32)
+        pixels += np.random.default_rng(seed).normal(0, noise, pixels.shape).astype(np.float32)
+        image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+        image = image.rotate(rng.uniform(-2, 2), expand=False, fillcolor=(214, 190, 150)).filter(ImageFilter.GaussianBlur(0.6))
+
+    rng.shuffle(lines)
+    return image, lines
+
+
+def mock_inference(latency_ms):
+    """Replacement for post_json that answers like the HF endpoints"""
+    class Response:
+        def __init__(self, data):
+            self.status_code = 200
+            self.http_version = "HTTP/2"
+            self.headers = {}
+            self._data = data
+            self.text = json.dumps(data)
+
+        def json(self):
+            return self._data
+
+    generation = json.dumps({
+        "explanation": [
+            "Moderate calories per serving with a balanced macronutrient split",
+            "Low saturated fat and sodium relative to daily values",
+            "Added sugars reach 20% of the daily value per serving",
+        ],
+        "health_impact": "Fine occasionally, but the added sugar adds up",
+        "consumption_frequency": "A few times a week",
+    })
+
+    async def post_json(url, payload, headers=None, timeout=None):
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        if "bart" in url:
+            return Response({"labels": ["healthy", "unhealthy"], "scores": [0.7, 0.3]})
+        return Response([{"generated_text": generation}])
+
+    return post_json
+
+
+def summarize(samples):
+    """Latency percentiles in milliseconds plus throughput for one stage"""
+    values = np.array(samples) * 1000
+    return {
+        "runs": len(values),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "throughput_per_s": round(float(1000 / values.mean()), 2) if values.mean() else None,
+    }
+
+
+def time_stage(func, arg, runs):
+    samples = []
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func(arg)
+        samples.append(time.perf_counter() - start)
+    return samples, result
+
+
+def run(args):
+    """Time every stage; returns (results, missing), missing mapping skipped stages to the reason"""
+    results = {}
+    missing = {}
+    ocr_available = not args.skip_ocr and importlib.util.find_spec("paddleocr") is not None
+    if args.skip_ocr:
+        missing["extract_text_from_image"] = "skipped with --skip-ocr"
+    elif not ocr_available:
+        logging.warning("PaddleOCR is not installed, skipping the OCR stage")
+        missing["extract_text_from_image"] = "PaddleOCR is not installed"
+    resilience.post_json = mock_inference(args.mock_latency_ms)
+
+    for resolution in args.resolutions:
+        for noise_name in args.noise:
+            image, lines = make_label(RESOLUTIONS[resolution], NOISE_LEVELS[noise_name])
+            case = f"{resolution}/{noise_name}"
+
+            samples, processed = time_stage(preprocess_image, image, args.runs)
+            results[f"preprocess_image[{case}]"] = summarize(samples)
+
+            if ocr_available:
+                # First call loads the models; keep it out of the numbers
+                extract_text_from_image(processed)
+                samples, _ = time_stage(extract_text_from_image, processed, max(1, args.runs // 5))
+                results[f"extract_text_from_image[{case}]"] = summarize(samples)
+
+            samples, raw_text = time_stage(lambda ocr_lines: format_rows(*boxes_to_array(ocr_lines)), lines, args.runs)
+            results[f"row_grouping[{case}]"] = summarize(samples)
+
+            samples, cleaned = time_stage(clean_nutrition_text, raw_text, args.runs)
+            results[f"clean_nutrition_text[{case}]"] = summarize(samples)
+
+    # The analysis stage only depends on the text, not on image size or noise
+    async def analyze_runs():
+        samples = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            await analysis.analyze_text(cleaned, {"age": 35, "hasDiabetes": True})
+            samples.append(time.perf_counter() - start)
+        return samples
+
+    results["analyze_text[mocked]"] = summarize(asyncio.run(analyze_runs()))
+    return results, missing
+
+
+def print_results(results, baseline=None, threshold=0.2):
+    """Print a table, comparing p50 against the baseline; returns the regressed stages"""
+    regressions = []
+    header = f"{'stage':<44}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>10}"
+    if baseline:
+        header += f"{'vs base':>10}"
+    print(header)
+    for stage, stats in results.items():
+        line = f"{stage:<44}{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}{stats['p99_ms']:>10.3f}{stats['throughput_per_s'] or 0:>10.1f}"
+        base = (baseline or {}).get(stage)
+        if base and base["p50_ms"]:
+            change = stats["p50_ms"] / base["p50_ms"] - 1
+            line += f"{change:>+10.0%}"
+            if change > threshold:
+                regressions.append(stage)
+                line += "  REGRESSION"
+        elif baseline:
+            line += f"{'no base':>10}"
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=20, help="timed runs per stage and case")
+    parser.add_argument("--resolutions", nargs="+", choices=RESOLUTIONS, default=list(RESOLUTIONS))
+    parser.add_argument("--noise", nargs="+", choices=NOISE_LEVELS, default=list(NOISE_LEVELS))
+    parser.add_argument("--skip-ocr", action="store_true", help="do not time PaddleOCR")
+    parser.add_argument("--mock-latency-ms", type=float, default=0.0, help="simulated latency of each model call")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write the results as a new baseline")
+    parser.add_argument("--compare", metavar="PATH", nargs="?", const=DEFAULT_BASELINE, help="compare p50 against a baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p50 slowdown that counts as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    # Per-call debug logging from the pipeline would dominate the timings
+    logging.basicConfig(level=logging.WARNING)
+
+    results, missing = run(args)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            recorded = json.load(f)
+        baseline = recorded["results"]
+        for stage, reason in recorded.get("missing", {}).items():
+            print(f"Baseline has no {stage} numbers: {reason}")
+        cpus = recorded.get("machine", {}).get("cpus")
+        if cpus != os.cpu_count():
+            print(f"Baseline was recorded on {cpus} CPU(s), this machine has {os.cpu_count()}; compare with care")
+    regressions = print_results(results, baseline, args.threshold)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump({
+                "machine": {
+                    "platform": platform.platform(),
+                    "python": platform.python_version(),
+                    "cpus": os.cpu_count(),
+                },
+                "runs": args.runs,
+                "results": results,
+                "missing": missing,
+            }, f, indent=2)
+        print(f"\nBaseline written to {args.save_baseline}")
+
+    if regressions and args.fail_on_regression:
+        raise SystemExit(f"{len(regressions)} stage(s) regressed by more than {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
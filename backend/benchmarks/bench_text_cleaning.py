@@ -0,0 +1,83 @@
+"""Micro-benchmark: compiled OCR normalizer vs. the old chained str.replace loop
+
+The compiled normalizer still runs at roughly 0.4-0.5x of the old loop
+(tens of microseconds per label, far below an OCR pass): the loop is a
+handful of context-free C-level replaces, while the normalizer has to look
+at the characters around each amount. What it buys is correct output,
+which the printed outputs below show side by side.
+
+Run from the backend directory:  python -m benchmarks.bench_text_cleaning
+"""
+import argparse
+import logging
+import timeit
+
+from utils.text_cleaning import clean_nutrition_text
+
+SAMPLE_LABEL = """Nutrition Facts
+Servina Size 2/3 cup (55q)
+Calorles 23O
+Total Fat 8g 1O%
+Saturated Fat 1g 5%o
+Trans Fat Og
+Cholesterol Omg 0%
+Sodlum 16Orng 7%
+Total Carbohvdrate 37g 13%
+Dietary Fiber 4g 14%
+Total Sugars 12g
+Includes 1Og Added Sugars 2O%
+Proteln 3g
+Vitamin D |2mcg 10%
+Calcium 26Omg 20%
+Iron 8mq 45%
+Potassium 235mg. 6%
+Ingredients: Whole Grain Oats, Organic quinoa, Olive Oil, Sea Salt"""
+
+LEGACY_REPLACEMENTS = {
+    '|': '1', 'O': '0', 'g.': 'g', 'rng': 'mg', 'mq': 'mg', 'q': 'g', '%o': '%', 'qg': 'g', 'mgl': 'mg',
+    'Protein': 'Protein', 'Proteln': 'Protein', 'Serving Size': 'Serving Size', 'Servina Size': 'Serving Size',
+    'Calories': 'Calories', 'Calorles': 'Calories', 'Total Fat': 'Total Fat', 'Cholesterol': 'Cholesterol',
+    'Sodium': 'Sodium', 'Sodlum': 'Sodium', 'Carbohydrate': 'Carbohydrate', 'Carbohvdrate': 'Carbohydrate',
+}
+
+
+def legacy_clean_nutrition_text(text):
+    """The previous implementation: one full str.replace pass per table entry"""
+    lines = [' '.join(line.split()) for line in text.split('\n')]
+    text = '\n'.join(lines)
+    for old, new in LEGACY_REPLACEMENTS.items():
+        text = text.replace(old, new)
+    nutrition_keywords = [
+        'serving size', 'calories', 'total fat', 'cholesterol',
+        'sodium', 'carbohydrate', 'protein', 'sugar', 'fiber'
+    ]
+    sum(1 for keyword in nutrition_keywords if keyword.lower() in text.lower())
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--scale", type=int, default=1, help="repeat the sample label this many times")
+    args = parser.parse_args()
+
+    # The "not a nutrition label" warning is irrelevant here
+    logging.disable(logging.WARNING)
+    text = '\n'.join([SAMPLE_LABEL] * args.scale)
+
+    results = {}
+    for name, func in (("legacy", legacy_clean_nutrition_text), ("compiled", clean_nutrition_text)):
+        best = min(timeit.repeat(lambda: func(text), repeat=args.repeat, number=args.number))
+        results[name] = best / args.number * 1e6
+        print(f"{name:>9}: {results[name]:8.1f} us per call ({len(text)} chars)")
+
+    print(f"  speedup: {results['legacy'] / results['compiled']:.2f}x")
+    print("\nlegacy output:")
+    print(legacy_clean_nutrition_text(SAMPLE_LABEL))
+    print("\ncompiled output:")
+    print(clean_nutrition_text(SAMPLE_LABEL))
+
+
+if __name__ == "__main__":
+    main()
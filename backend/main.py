@@ -1,23 +1,88 @@
-from fastapi import FastAPI, UploadFile, File, Body
-from PIL import Image
-import io
-from utils.image_processing import preprocess_image, extract_text_from_image
-from utils.analysis import analyze_text
+from fastapi import FastAPI, UploadFile, File, Form, Body, Header
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+from utils.analysis import analyze_text, analyze_text_stages, is_fallback_analysis
+from utils.inference_client import close_client
+from utils.executor import start_ocr_executor, shutdown_ocr_executor, run_ocr, run_ocr_batch, QueueFullError, executor_stats, warm_up_timings
+from utils.ocr_engine import shutdown_ocr_engines
+from utils.jobs import JobManager, JobStore, FINISHED_STATES
+from utils.singleflight import SingleFlight
+from utils.resilience import resilience_stats
+from utils.backends import load_backends
+from utils.readiness import Readiness
+from utils.history import build_history_store, client_id
+from utils.products import build_product_store
+from utils.uploads import read_upload, UploadLimitMiddleware, UploadTooLargeError, MAX_UPLOAD_BYTES
+from utils.cache import build_ocr_cache, build_analysis_cache, analysis_cache_key, hash_bytes
+from utils.metrics import RequestMetricsMiddleware, register_cache, register_executor, metrics_registry, process_memory
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from contextlib import asynccontextmanager
 import logging
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional, Dict
+from typing import Optional, Dict, List
+import asyncio
+import io
+import json
+import os
+import sqlite3
+import zipfile
 from pydantic import BaseModel
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Startup steps that /health/ready waits for
+readiness = Readiness("ocr", "inference_backends")
+
+
+async def warm_up_models():
+    await readiness.run_step("ocr", start_ocr_executor)
+    await readiness.run_step("inference_backends", load_backends)
+    memory = process_memory()
+    if memory:
+        logging.info(
+            f"Worker {os.getpid()} warmed up: rss={memory['rss'] / 2**20:.0f}MB "
+            f"private={memory['private'] / 2**20:.0f}MB shared={memory['shared'] / 2**20:.0f}MB"
+        )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load and warm up the models once instead of on every upload. This runs in
+    # the background so liveness answers at once; /health/ready waits for it.
+    warm_up = asyncio.create_task(warm_up_models())
+    job_manager.start()
+    yield
+    warm_up.cancel()
+    await job_manager.stop()
+    shutdown_ocr_executor()
+    shutdown_ocr_engines()
+    await close_client()
+
+# Upper bound on images accepted by /analyze-labels in one request
+MAX_BATCH_ITEMS = int(os.getenv("MAX_BATCH_ITEMS", "50"))
+# Remote analyses run at the same time for one batch request
+BATCH_ANALYSIS_CONCURRENCY = int(os.getenv("BATCH_ANALYSIS_CONCURRENCY", "4"))
+# Upper bound on all files of one /analyze-labels request together
+MAX_BATCH_UPLOAD_BYTES = int(os.getenv("MAX_BATCH_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.tif', '.tiff')
+# Seconds a queued job keeps waiting for OCR capacity before it fails
+JOB_OCR_WAIT = float(os.getenv("JOB_OCR_WAIT", "300"))
+
 app = FastAPI(
     title="Food Label Analyzer API",
     description="API for analyzing food labels using OCR and AI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
+)
+
+# Oversized uploads are refused while they stream in, before the form parser spools them to disk
+app.add_middleware(
+    UploadLimitMiddleware,
+    max_bytes=MAX_UPLOAD_BYTES,
+    route_limits={"/analyze-labels": MAX_BATCH_UPLOAD_BYTES},
 )
 
-# Add after creating the FastAPI app
+# Add after creating the FastAPI app (and after the upload limit, so its 413s get CORS headers too)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # React dev server
@@ -26,6 +91,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Cleaned OCR text keyed by a hash of the uploaded bytes
+ocr_cache = build_ocr_cache()
+# Analysis output keyed by normalized text and health profile
+analysis_cache = build_analysis_cache()
+
+# Identical uploads or label texts arriving together share one OCR run or analysis
+ocr_flight = SingleFlight("ocr")
+analysis_flight = SingleFlight("analysis")
+
+# Finished analyses, served again by /history and /results without recomputing
+history_store = build_history_store()
+# Optional offline product database; known products skip OCR altogether
+product_store = build_product_store()
+
+register_cache("ocr", ocr_cache)
+register_cache("analysis", analysis_cache)
+register_executor(executor_stats)
+
+# Outermost, so it also times requests the upload limit rejects
+app.add_middleware(RequestMetricsMiddleware)
+
 class HealthProfile(BaseModel):
     age: Optional[int]
     weight: Optional[float]
@@ -37,21 +123,93 @@ class HealthProfile(BaseModel):
     allergies: Optional[str]
     dietaryRestrictions: Optional[str]
 
+async def ocr_cached(image_hash, contents):
+    """OCR an upload unless the same image was read recently or is being read right now"""
+    extracted_text = await ocr_cache.get(image_hash)
+    if extracted_text is None:
+        extracted_text = await ocr_flight.do(image_hash, ocr_and_store, image_hash, contents)
+    return extracted_text
+
+async def ocr_and_store(image_hash, contents):
+    # Preprocess and extract text on the OCR worker pool
+    extracted_text = await run_ocr(contents)
+    if extracted_text:
+        await ocr_cache.set(image_hash, extracted_text)
+    return extracted_text
+
+async def analyze_cached(extracted_text, health_profile):
+    """Run analyze_text unless the same text and profile were analyzed recently or are in flight"""
+    analysis_key = analysis_cache_key(extracted_text, health_profile)
+    analysis = await analysis_cache.get(analysis_key)
+    if analysis is None:
+        analysis = await analysis_flight.do(analysis_key, analyze_and_store, analysis_key, extracted_text, health_profile)
+    return analysis
+
+async def analyze_and_store(analysis_key, extracted_text, health_profile):
+    analysis = await analyze_text(extracted_text, health_profile)
+    if not is_fallback_analysis(analysis):
+        await analysis_cache.set(analysis_key, analysis)
+    return analysis
+
+async def record_history(client_key, image_hash, extracted_text, analysis, health_profile):
+    """Store a finished analysis for the client and return its id
+
+    None when history is off, the request carried no usable X-Client-Key or
+    the analysis failed.
+    """
+    client = client_id(client_key)
+    if history_store is None or client is None or is_fallback_analysis(analysis):
+        return None
+    try:
+        return await asyncio.to_thread(history_store.add, client, image_hash, extracted_text, analysis, health_profile)
+    except sqlite3.Error as e:
+        # Losing a history entry must not fail the analysis itself
+        logging.error(f"Could not record analysis history: {str(e)}")
+        return None
+
 @app.post("/analyze-label")
 async def analyze_label(
-    file: UploadFile = File(...),
-    health_profile: Optional[Dict] = Body(None)
+    file: Optional[UploadFile] = File(None),
+    barcode: Optional[str] = Form(None),
+    product_name: Optional[str] = Form(None),
+    health_profile: Optional[Dict] = Body(None),
+    client_key: Optional[str] = Header(None, alias="X-Client-Key")
 ):
     try:
-        # Read image file
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
-        
-        # Process image
-        processed_image = preprocess_image(image)
+        # A product from the offline database needs neither the photo nor OCR,
+        # but a fuzzy name match is only a guess and never beats an uploaded photo
+        product = None
+        if product_store is not None and (barcode or product_name):
+            product = await asyncio.to_thread(product_store.lookup, barcode, product_name)
+        if product is not None and (file is None or product["match"] != "fuzzy"):
+            analysis = await analyze_cached(product["label_text"], health_profile)
+            return {
+                "success": True,
+                "source": "product_db",
+                "product": {key: product[key] for key in ("match", "barcode", "name", "brand", "nutrition")},
+                "result_id": await record_history(client_key, None, product["label_text"], analysis, health_profile),
+                "extracted_text": product["label_text"],
+                "analysis": analysis
+            }
+        if file is None:
+            if barcode or product_name:
+                return JSONResponse(
+                    status_code=404,
+                    content={"success": False, "error": "Unknown product, please upload a photo of the label"}
+                )
+            return JSONResponse(
+                status_code=400,
+                content={"success": False, "error": "Upload a photo of the label or give a barcode or product name"}
+            )
+
+        # Read image file, giving up as soon as it is over the size limit
+        contents = await read_upload(file)
+        image_hash = hash_bytes(contents)
         
-        # Extract text
-        extracted_text = extract_text_from_image(processed_image)
+        # Re-uploads of the same photo skip OCR entirely
+        extracted_text = await ocr_cached(image_hash, contents)
+        # The raw upload is not needed during the (slow) analysis
+        del contents
         
         if not extracted_text:
             return {
@@ -60,14 +218,25 @@ async def analyze_label(
             }
         
         # Analyze text with health profile
-        analysis = analyze_text(extracted_text, health_profile)
+        analysis = await analyze_cached(extracted_text, health_profile)
         
         return {
             "success": True,
+            "source": "ocr",
+            "result_id": await record_history(client_key, image_hash, extracted_text, analysis, health_profile),
             "extracted_text": extracted_text,
             "analysis": analysis
         }
         
+    except UploadTooLargeError as e:
+        return too_large_response(e)
+    except QueueFullError as e:
+        logging.warning("Rejecting upload, OCR queue is full")
+        return JSONResponse(
+            status_code=503,
+            content={"success": False, "error": str(e)},
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         logging.error(f"Error processing image: {str(e)}")
         return {
@@ -75,10 +244,387 @@ async def analyze_label(
             "error": str(e)
         }
 
+def too_large_response(error):
+    return JSONResponse(status_code=413, content={"success": False, "error": str(error)})
+
+def format_event(stage, data, stream_format):
+    """Encode one pipeline stage as a Server-Sent Event or an NDJSON line"""
+    if stream_format == "ndjson":
+        return json.dumps({"stage": stage, **data}) + "\n"
+    return f"event: {stage}\ndata: {json.dumps(data)}\n\n"
+
+async def label_pipeline(contents, health_profile, client_key=None):
+    """Run OCR and analysis on one upload, yielding (stage, data) as each stage completes
+
+    Ends with a "result" stage, or an "error" stage when the label is unreadable.
+    """
+    image_hash = hash_bytes(contents)
+    extracted_text = await ocr_cached(image_hash, contents)
+    del contents
+
+    if not extracted_text:
+        yield "error", {"error": "Could not read the label. Please try a clearer image."}
+        return
+    yield "extracted_text", {"extracted_text": extracted_text}
+
+    analysis_key = analysis_cache_key(extracted_text, health_profile)
+    analysis = await analysis_cache.get(analysis_key)
+    if analysis is None:
+        # Another request analyzing the same text is finished sooner than a new run
+        analysis = await analysis_flight.join(analysis_key)
+    if analysis is None:
+        with analysis_flight.lead(analysis_key) as flight:
+            async for stage, data in analyze_text_stages(extracted_text, health_profile):
+                if stage == "result":
+                    analysis = data["analysis"]
+                else:
+                    yield stage, data
+            if not is_fallback_analysis(analysis):
+                await analysis_cache.set(analysis_key, analysis)
+            flight.set_result(analysis)
+
+    result_id = await record_history(client_key, image_hash, extracted_text, analysis, health_profile)
+    yield "result", {"success": True, "result_id": result_id, "extracted_text": extracted_text, "analysis": analysis}
+
+@app.post("/analyze-label/stream")
+async def analyze_label_stream(
+    file: UploadFile = File(...),
+    health_profile: Optional[Dict] = Body(None),
+    format: str = "sse",
+    client_key: Optional[str] = Header(None, alias="X-Client-Key")
+):
+    """Same pipeline as /analyze-label, but each stage is sent as soon as it is ready"""
+    try:
+        contents = await read_upload(file)
+    except UploadTooLargeError as e:
+        return too_large_response(e)
+
+    async def events():
+        try:
+            async for stage, data in label_pipeline(contents, health_profile, client_key):
+                yield format_event(stage, data, format)
+        except QueueFullError as e:
+            yield format_event("error", {"error": str(e), "retry_after": e.retry_after}, format)
+        except Exception as e:
+            logging.error(f"Error streaming analysis: {str(e)}")
+            yield format_event("error", {"error": str(e)}, format)
+
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/event-stream"
+    return StreamingResponse(
+        events(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def run_job(payload):
+    """Job runner: the label pipeline, waiting up to JOB_OCR_WAIT seconds for OCR capacity"""
+    contents, health_profile, client_key = payload
+    waited = 0
+    while True:
+        try:
+            async for stage, data in label_pipeline(contents, health_profile, client_key):
+                yield stage, data
+            return
+        except QueueFullError as e:
+            # Still busy (or OCR never started); the job manager fails the job with this error
+            if waited + e.retry_after > JOB_OCR_WAIT:
+                raise
+            # OCR runs before any stage is yielded, so retrying repeats nothing
+            await asyncio.sleep(e.retry_after)
+            waited += e.retry_after
+
+job_manager = JobManager(
+    run_job,
+    workers=int(os.getenv("JOB_WORKERS", "4")),
+    max_queued=int(os.getenv("JOB_QUEUE_SIZE", "100")),
+    ttl=int(os.getenv("JOB_TTL", "3600")),
+    # Shared by the worker processes of serve.py, so any of them can answer for a job
+    store=JobStore(os.getenv("JOB_DB")) if os.getenv("JOB_DB") else None,
+)
+
+@app.post("/jobs", status_code=202)
+async def submit_job(
+    file: UploadFile = File(...),
+    health_profile: Optional[Dict] = Body(None),
+    client_key: Optional[str] = Header(None, alias="X-Client-Key")
+):
+    """Queue a label for analysis and return its job id right away"""
+    if readiness.failed("ocr"):
+        # No OCR capacity will ever free up, so the job could only wait and fail
+        return JSONResponse(status_code=503, content={"success": False, "error": "OCR is unavailable on this server"})
+    try:
+        contents = await read_upload(file)
+    except UploadTooLargeError as e:
+        return too_large_response(e)
+    try:
+        job = await job_manager.submit((contents, health_profile, client_key))
+    except QueueFullError as e:
+        return JSONResponse(
+            status_code=503,
+            content={"success": False, "error": str(e)},
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    return {"success": True, "job_id": job.id, "state": job.state}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0):
+    """Job state with the stages finished so far; wait=N long-polls up to N seconds for progress"""
+    job = await job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"success": False, "error": "Unknown or expired job"})
+    if wait > 0:
+        job = await job_manager.wait_for_events(job, len(job.events), timeout=min(wait, 60))
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, format: str = "sse"):
+    """Subscribe to a job: replays the stages so far, then sends each new one until it finishes"""
+    job = await job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"success": False, "error": "Unknown or expired job"})
+
+    async def events():
+        current = job
+        seen = 0
+        while True:
+            for stage, data in current.events[seen:]:
+                yield format_event(stage, data, format)
+            seen = len(current.events)
+            if current.state in FINISHED_STATES:
+                return
+            current = await job_manager.wait_for_events(current, seen, timeout=15)
+
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/event-stream"
+    return StreamingResponse(
+        events(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    job = await job_manager.cancel(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"success": False, "error": "Unknown or expired job"})
+    return {"success": True, "job_id": job.id, "state": job.state}
+
+def expand_uploads(filename, contents, max_bytes=MAX_BATCH_UPLOAD_BYTES):
+    """Yield (name, bytes, error) for an image upload or for each file inside a zip
+
+    Images are extracted one at a time as the caller asks for them, and a
+    zip whose images add up to more than max_bytes raises
+    UploadTooLargeError before the image that crosses the limit is read.
+    Zip entries that are skipped come back with no bytes and the reason.
+    """
+    if not zipfile.is_zipfile(io.BytesIO(contents)):
+        if len(contents) > MAX_UPLOAD_BYTES:
+            raise UploadTooLargeError(MAX_UPLOAD_BYTES)
+        yield filename, contents, None
+        return
+
+    with zipfile.ZipFile(io.BytesIO(contents)) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or info.filename.startswith('__MACOSX/'):
+                continue
+            name = f"{filename}/{info.filename}"
+            if not info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                yield name, None, "Not an image file"
+                continue
+            if info.file_size > MAX_UPLOAD_BYTES:
+                yield name, None, str(UploadTooLargeError(MAX_UPLOAD_BYTES))
+                continue
+            # Reads stop at the declared size, so this bounds what extraction can allocate
+            max_bytes -= info.file_size
+            if max_bytes < 0:
+                raise UploadTooLargeError(MAX_BATCH_UPLOAD_BYTES)
+            yield name, archive.read(info), None
+
+def collect_batch_items(filename, contents, items, max_bytes):
+    """Append (name, bytes, hash, error) to items for one batch upload; runs in a worker thread
+
+    Returns the image bytes added, or None once the batch is over MAX_BATCH_ITEMS.
+    """
+    added = 0
+    for name, image, error in expand_uploads(filename, contents, max_bytes):
+        if len(items) == MAX_BATCH_ITEMS:
+            return None
+        if image is None:
+            items.append((name, None, None, error))
+            continue
+        items.append((name, image, hash_bytes(image), None))
+        added += len(image)
+    return added
+
+@app.post("/analyze-labels")
+async def analyze_labels(
+    files: List[UploadFile] = File(...),
+    health_profile: Optional[Dict] = Body(None),
+    client_key: Optional[str] = Header(None, alias="X-Client-Key")
+):
+    """Analyze many label images (or zips of images) and report per-item results"""
+    try:
+        items = []
+        remaining = MAX_BATCH_UPLOAD_BYTES
+        for file in files:
+            contents = await read_upload(file, remaining)
+            # Unzipping and hashing are CPU-bound; charge the extracted images, not the zip, against the limit
+            added = await asyncio.to_thread(collect_batch_items, file.filename, contents, items, remaining)
+            if added is None:
+                return JSONResponse(
+                    status_code=413,
+                    content={"success": False, "error": f"At most {MAX_BATCH_ITEMS} images per batch"}
+                )
+            remaining -= added
+            del contents
+
+        hashes = [image_hash for _, _, image_hash, _ in items]
+        errors = [error for _, _, _, error in items]
+        texts = [None] * len(items)
+        readable = [i for i, image_hash in enumerate(hashes) if image_hash]
+        for i, text in zip(readable, await asyncio.gather(*[ocr_cache.get(hashes[i]) for i in readable])):
+            texts[i] = text
+
+        # OCR only the cache misses, once per distinct image, in parallel batches across the workers
+        misses = {}
+        for i, text in enumerate(texts):
+            if text is None and not errors[i]:
+                misses.setdefault(hashes[i], []).append(i)
+        if misses:
+            ocr_results = await run_ocr_batch([items[indices[0]][1] for indices in misses.values()])
+            for (image_hash, indices), (text, error) in zip(misses.items(), ocr_results):
+                for i in indices:
+                    texts[i], errors[i] = text, error
+                if text:
+                    await ocr_cache.set(image_hash, text)
+
+        semaphore = asyncio.Semaphore(BATCH_ANALYSIS_CONCURRENCY)
+
+        async def analyze_item(i):
+            name = items[i][0]
+            if errors[i] or not texts[i]:
+                return {
+                    "filename": name,
+                    "success": False,
+                    "error": errors[i] or "Could not read the label. Please try a clearer image."
+                }
+            try:
+                async with semaphore:
+                    analysis = await analyze_cached(texts[i], health_profile)
+                return {
+                    "filename": name,
+                    "success": True,
+                    "result_id": await record_history(client_key, hashes[i], texts[i], analysis, health_profile),
+                    "extracted_text": texts[i],
+                    "analysis": analysis
+                }
+            except Exception as e:
+                logging.error(f"Error analyzing {name}: {str(e)}")
+                return {"filename": name, "success": False, "error": str(e)}
+
+        results = await asyncio.gather(*[analyze_item(i) for i in range(len(items))])
+        return {
+            "success": True,
+            "count": len(results),
+            "results": results
+        }
+
+    except UploadTooLargeError as e:
+        return too_large_response(e)
+    except QueueFullError as e:
+        return JSONResponse(
+            status_code=503,
+            content={"success": False, "error": str(e)},
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except Exception as e:
+        logging.error(f"Error processing batch: {str(e)}")
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+def history_client(client_key):
+    """The hashed client for a history request, or an error response"""
+    if history_store is None:
+        return None, JSONResponse(status_code=404, content={"success": False, "error": "History is disabled"})
+    client = client_id(client_key)
+    if client is None:
+        return None, JSONResponse(status_code=401, content={"success": False, "error": "Missing or too short X-Client-Key"})
+    return client, None
+
+@app.get("/history")
+async def history(
+    limit: int = 20,
+    before: Optional[str] = None,
+    image_hash: Optional[str] = None,
+    client_key: Optional[str] = Header(None, alias="X-Client-Key")
+):
+    """The client's past analyses, newest first; pass next_before back as before= to get the next page"""
+    client, error = history_client(client_key)
+    if error is not None:
+        return error
+    items, next_before = await asyncio.to_thread(history_store.page, client, max(1, min(limit, 100)), before, image_hash)
+    return {"success": True, "items": items, "next_before": next_before}
+
+@app.get("/results/{result_id}")
+async def get_result(result_id: str, client_key: Optional[str] = Header(None, alias="X-Client-Key")):
+    """One of the client's past analyses with its extracted text, as returned when it was made"""
+    client, error = history_client(client_key)
+    if error is not None:
+        return error
+    result = await asyncio.to_thread(history_store.get, client, result_id)
+    if result is None:
+        return JSONResponse(status_code=404, content={"success": False, "error": "Unknown result"})
+    return {"success": True, **result}
+
+@app.get("/cache-stats")
+async def cache_stats():
+    return {
+        "ocr": {**ocr_cache.stats(), "single_flight": ocr_flight.stats()},
+        "analysis": {**analysis_cache.stats(), "single_flight": analysis_flight.stats()},
+    }
+
+@app.get("/job-stats")
+async def job_stats():
+    return job_manager.stats()
+
+@app.get("/resilience-stats")
+async def model_resilience_stats():
+    return resilience_stats()
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(generate_latest(metrics_registry()), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/worker-stats")
+async def worker_stats():
+    """Memory of the worker process that answered, in bytes"""
+    return {"pid": os.getpid(), "memory": process_memory()}
+
 @app.get("/health")
+@app.get("/health/live")
 async def health_check():
+    """Liveness: the process is up and serving HTTP, even while models load"""
     return {"status": "healthy"}
 
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness: models are loaded and warmed up and the OCR queue has room"""
+    queue = executor_stats()
+    queue_full = queue["max_pending"] > 0 and queue["pending"] >= queue["max_pending"]
+    ready = readiness.ready and not queue_full
+    body = {
+        "status": "ready" if ready else "not_ready",
+        "steps": readiness.report(),
+        "warm_up": warm_up_timings(),
+        "queue": queue,
+        "queue_full": queue_full,
+        "jobs": job_manager.stats(),
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=body)
+
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    # Loads the models once and forks the HTTP workers; see serve.py
+    import serve
+    serve.main()
@@ -0,0 +1,115 @@
+"""Multi-worker server that loads the OCR models once and forks the HTTP workers
+
+The master process imports paddle and loads the OCR engines, then gunicorn
+forks WEB_WORKERS uvicorn workers that share those pages copy-on-write, so
+each extra worker costs its private memory only instead of another full set
+of models. Each worker runs OCR on its inherited engines in-process
+(OCR_WORKERS=0) and does the warm-up inference itself after the fork, since
+the inference thread pools do not survive it. /worker-stats and the
+eatwise_process_memory_bytes metric report shared and private memory per
+worker.
+
+Run from the backend directory:
+
+    python serve.py
+    WEB_WORKERS=4 OCR_CPU_THREADS=2 PORT=8000 python serve.py
+
+Set PROMETHEUS_MULTIPROC_DIR to a writable directory to have /metrics
+aggregate counters and histograms over all workers. Jobs from /jobs run in
+the worker that accepted them and are shared with the others through the
+SQLite file at JOB_DB (a per-port file in the temp directory by default).
+"""
+import gc
+import glob
+import logging
+import os
+import tempfile
+
+from gunicorn.app.base import BaseApplication
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", str(os.cpu_count() or 1)))
+
+# OCR runs inside the HTTP workers on the preloaded engines, with the cores
+# split between them; these must be set before paddle is imported
+os.environ.setdefault("OCR_WORKERS", "0")
+os.environ.setdefault("OCR_CPU_THREADS", str(max(1, (os.cpu_count() or 1) // WEB_WORKERS)))
+os.environ.setdefault("OMP_NUM_THREADS", os.environ["OCR_CPU_THREADS"])
+# Job state lives in a file every worker reads, so a job can be polled through any of them
+os.environ.setdefault("JOB_DB", os.path.join(tempfile.gettempdir(), f"eatwise-jobs-{PORT}.db"))
+
+
+def preload_models():
+    """Load the OCR engines in the master so the forked workers inherit them"""
+    if os.environ["OCR_WORKERS"] != "0":
+        logging.warning("OCR_WORKERS is set; every HTTP worker starts its own OCR processes and nothing is shared")
+        return
+
+    from utils.ocr_engine import init_ocr_engines
+    from utils.metrics import process_memory
+
+    # Warm-up inference happens in each worker, after the fork
+    init_ocr_engines(warm_up=False)
+    # Keep the collector from writing to (and so copying) every inherited object
+    gc.freeze()
+
+    memory = process_memory()
+    if memory:
+        logging.info(f"Models preloaded in master {os.getpid()}: rss={memory['rss'] / 2**20:.0f}MB")
+
+
+def child_exit(server, worker):
+    """Drop a dead worker's live gauges from the shared metrics directory"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+
+
+class EatWiseServer(BaseApplication):
+    """gunicorn with uvicorn workers, configured from code instead of a config file"""
+
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        # Imported in each worker after the fork, so per-process state such as
+        # the SQLite cache connection and the HTTP client is never shared
+        from main import app
+        return app
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    # Jobs do not survive a restart (their uploads were in memory), so neither does their state
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(os.environ["JOB_DB"] + suffix):
+            os.remove(os.environ["JOB_DB"] + suffix)
+
+    multiproc_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        # Metric files left by a previous run would be counted again; anything else there is not ours
+        os.makedirs(multiproc_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(multiproc_dir, "*.db")):
+            os.remove(path)
+
+    preload_models()
+    EatWiseServer({
+        "bind": f"{HOST}:{PORT}",
+        "workers": WEB_WORKERS,
+        "worker_class": "uvicorn_worker.UvicornWorker",
+        # Warm-up runs in the background, so a booting worker still answers heartbeats
+        "timeout": int(os.getenv("WORKER_TIMEOUT", "120")),
+        "graceful_timeout": 30,
+        "child_exit": child_exit,
+    }).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import pytest
+
+from utils.nutrition_parser import NutritionFacts, parse_nutrition_facts, score_nutrition
+
+
+@pytest.mark.parametrize("text, field, expected", [
+    # A comma before exactly three digits groups thousands
+    ("Sodium 1,820mg 79%", "sodium_mg", 1820),
+    ("Sodium 1,000 mg", "sodium_mg", 1000),
+    ("Sodium 12,345.5mg", "sodium_mg", 12345.5),
+    ("Energy 2,092 kJ", "calories_kcal", 500),
+    # A comma before one or two digits is a decimal comma
+    ("Total Fat 1,5 g", "total_fat_g", 1.5),
+    ("Protein 12,25g", "protein_g", 12.25),
+    ("Protein 2.5g", "protein_g", 2.5),
+    ("Sodium 160mg 7%", "sodium_mg", 160),
+])
+def test_parses_comma_grouped_amounts(text, field, expected):
+    assert getattr(parse_nutrition_facts(text), field) == pytest.approx(expected)
+
+
+def test_thousands_separator_is_not_scored_as_low_sodium():
+    salty = parse_nutrition_facts("Sodium 1,820mg 79%")
+    assert score_nutrition(salty) == score_nutrition(NutritionFacts(sodium_mg=1820)) < 0
+    assert score_nutrition(salty) < score_nutrition(NutritionFacts(sodium_mg=1.82))
@@ -0,0 +1,51 @@
+import pytest
+
+from utils.text_cleaning import normalize_ocr_text
+
+
+@pytest.mark.parametrize("text, expected", [
+    # Runs of look-alikes inside a number
+    ("Calories 2OO", "Calories 200"),
+    ("Sodium 1OOmg", "Sodium 100mg"),
+    ("Energy 1OOO kJ", "Energy 1000 kJ"),
+    ("Sodium 1,OOO mg", "Sodium 1,000 mg"),
+    # Decimals
+    ("Sugars 2.O g", "Sugars 2.0 g"),
+    # A trailing "l" after a look-alike run is still the litre unit
+    ("Volume 1Ol", "Volume 10l"),
+    # Uppercase units
+    ("TOTAL FAT 1OG", "TOTAL FAT 10G"),
+    ("SODIUM 16OMG", "SODIUM 160MG"),
+    # A lone look-alike before a mass unit
+    ("Trans Fat Og", "Trans Fat 0g"),
+    ("Cholesterol Omg", "Cholesterol 0mg"),
+    ("Vitamin D |2mcg", "Vitamin D 12mcg"),
+    # Unit typos after a number
+    ("Sodium 16Orng", "Sodium 160mg"),
+    ("Serving Size 2/3 cup (55q)", "Serving Size 2/3 cup (55g)"),
+    ("Saturated Fat 1g 5%o", "Saturated Fat 1g 5%"),
+    ("Potassium 235mg.", "Potassium 235mg"),
+    # Word fixes
+    ("Calorles 230", "Calories 230"),
+    ("Proteln 3g", "Protein 3g"),
+])
+def test_fixes_ocr_errors(text, expected):
+    assert normalize_ocr_text(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "log",
+    "Oats",
+    "Iron 8mg",
+    "Olive Oil",
+    "Whole Grain Oats, Organic quinoa",
+    "3lbs",
+    "I cup",
+    "10 l",
+    # "l" after digits is the litre unit, not a 1
+    "Volume 1l",
+    "Net 1.5l",
+    "Net 1.5 L",
+])
+def test_leaves_words_alone(text):
+    assert normalize_ocr_text(text) == text
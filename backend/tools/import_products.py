@@ -0,0 +1,140 @@
+"""Bulk import an Open Food Facts dump into the product database used by /analyze-label
+
+Reads the tab-separated CSV export (en.openfoodfacts.org.products.csv) or
+the JSONL export, optionally gzipped, and writes one row per product with a
+barcode and at least --min-fields nutrients. Values are converted from the
+dump's per-100g figures to one serving when the serving size is known, to
+match what a label shows. Indexes are built once at the end, so millions
+of rows import in minutes.
+
+Run from the backend directory, then point the API at the result:
+
+    python -m tools.import_products en.openfoodfacts.org.products.csv.gz --db products.db
+    PRODUCT_DB=products.db python main.py
+"""
+import argparse
+import csv
+import gzip
+import json
+import logging
+import sqlite3
+import sys
+import time
+
+from utils.nutrition_parser import NutritionFacts
+from utils.products import barcode_candidates, create_indexes, create_schema, name_key
+
+# Open Food Facts nutriment keys (per 100g) and the multiplier to our field's unit
+NUTRIMENTS = {
+    'calories_kcal': ('energy-kcal_100g', 1),
+    'total_fat_g': ('fat_100g', 1),
+    'saturated_fat_g': ('saturated-fat_100g', 1),
+    'trans_fat_g': ('trans-fat_100g', 1),
+    'cholesterol_mg': ('cholesterol_100g', 1000),
+    'sodium_mg': ('sodium_100g', 1000),
+    'total_carbohydrate_g': ('carbohydrates_100g', 1),
+    'dietary_fiber_g': ('fiber_100g', 1),
+    'total_sugars_g': ('sugars_100g', 1),
+    'added_sugars_g': ('added-sugars_100g', 1),
+    'protein_g': ('proteins_100g', 1),
+}
+
+INSERT = "INSERT OR REPLACE INTO products (barcode, name, name_key, brand, facts) VALUES (?, ?, ?, ?, ?)"
+
+
+def _number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if number >= 0 else None
+
+
+def to_product(record, min_fields):
+    """(barcode, name, name_key, brand, facts JSON) for one dump record, or None to skip it"""
+    codes = barcode_candidates(record.get('code'))
+    if not codes:
+        return None
+
+    nutriments = record.get('nutriments') or record
+    if nutriments.get('energy-kcal_100g') in (None, '') and _number(nutriments.get('energy_100g')) is not None:
+        # Older entries only have kJ
+        nutriments = {**nutriments, 'energy-kcal_100g': _number(nutriments['energy_100g']) / 4.184}
+
+    serving = _number(record.get('serving_quantity'))
+    scale = serving / 100 if serving else 1.0
+    facts = NutritionFacts(serving_size_g=serving or 100.0)
+    for field, (key, multiplier) in NUTRIMENTS.items():
+        value = _number(nutriments.get(key))
+        if value is not None:
+            setattr(facts, field, round(value * multiplier * scale, 3))
+
+    if facts.known_fields() - 1 < min_fields:
+        return None
+    name = (record.get('product_name') or '').strip() or None
+    brand = (record.get('brands') or '').split(',')[0].strip() or None
+    return codes[0], name, name_key(name), brand, json.dumps(facts.to_dict(), separators=(',', ':'))
+
+
+def read_records(path):
+    """Yield dump records as dicts from a CSV/TSV or JSONL file, gzipped or not"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', errors='replace', newline='') as f:
+        if '.jsonl' in path or '.json' in path:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            # Some ingredient lists are longer than the csv module's default field limit
+            csv.field_size_limit(sys.maxsize)
+            yield from csv.DictReader(f, delimiter='\t', quoting=csv.QUOTE_NONE)
+
+
+def import_products(source, db_path, batch_size=10000, min_fields=3):
+    conn = sqlite3.connect(db_path)
+    # The database is rebuilt from the dump if the import dies, so skip the journal
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA cache_size=-262144")
+    create_schema(conn)
+
+    start = time.perf_counter()
+    seen = imported = 0
+    batch = []
+    for record in read_records(source):
+        seen += 1
+        product = to_product(record, min_fields)
+        if product is not None:
+            batch.append(product)
+        if len(batch) >= batch_size:
+            conn.executemany(INSERT, batch)
+            conn.commit()
+            imported += len(batch)
+            batch = []
+            logging.info(f"{imported} products imported from {seen} records")
+    if batch:
+        conn.executemany(INSERT, batch)
+        conn.commit()
+        imported += len(batch)
+
+    logging.info("Building indexes")
+    create_indexes(conn)
+    conn.close()
+    logging.info(f"Imported {imported} of {seen} records in {time.perf_counter() - start:.0f}s")
+    return imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="Open Food Facts CSV or JSONL dump, optionally .gz")
+    parser.add_argument("--db", default="products.db", help="SQLite database to create or update")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--min-fields", type=int, default=3, help="skip products with fewer known nutrients")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    import_products(args.source, args.db, args.batch_size, args.min_fields)
+
+
+if __name__ == "__main__":
+    main()
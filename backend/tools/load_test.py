@@ -0,0 +1,146 @@
+"""Drive the running API at a fixed concurrency and report throughput and tail latency
+
+Each of --concurrency clients sends its next request as soon as the last one
+finishes, until --requests are sent or --duration seconds pass. Uploads are
+synthetic labels from benchmarks.bench_pipeline unless --image is given;
+--unique varies every upload so the OCR cache does not hide the OCR cost
+(identical label text still hits the analysis cache).
+
+Run from the backend directory against a server using the mock inference API:
+
+    python -m tools.mock_inference --port 8001 &
+    HF_API_BASE=http://127.0.0.1:8001/models python main.py &
+    python -m tools.load_test --concurrency 16 --duration 60 --unique
+"""
+import argparse
+import asyncio
+import io
+import json
+import time
+from collections import Counter
+
+import httpx
+import numpy as np
+from PIL import Image
+
+from benchmarks.bench_pipeline import make_label, RESOLUTIONS
+
+
+def encode_jpeg(image, quality=90):
+    buffer = io.BytesIO()
+    image.convert('RGB').save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def make_uploads(args):
+    """Image bytes to cycle through; one per request when --unique is set"""
+    if args.image:
+        with open(args.image, 'rb') as f:
+            base = Image.open(io.BytesIO(f.read()))
+            base.load()
+    else:
+        base, _ = make_label(RESOLUTIONS[args.resolution], noise=6.0)
+
+    if not args.unique:
+        return [encode_jpeg(base)]
+
+    uploads = []
+    count = args.requests or 200
+    pixels = np.asarray(base.convert('RGB'))
+    for i in range(count):
+        # A one-pixel change is enough for a new image hash
+        varied = pixels.copy()
+        varied[i // varied.shape[1] % varied.shape[0], i % varied.shape[1]] ^= 1
+        uploads.append(encode_jpeg(Image.fromarray(varied)))
+    return uploads
+
+
+async def run_load(args, uploads):
+    url = args.url.rstrip('/') + args.endpoint
+    latencies = []
+    statuses = Counter()
+    outcomes = Counter()
+    sent = 0
+    deadline = time.perf_counter() + args.duration if args.duration else None
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+        async def worker():
+            nonlocal sent
+            while True:
+                if args.requests and sent >= args.requests:
+                    return
+                if deadline and time.perf_counter() >= deadline:
+                    return
+                contents = uploads[sent % len(uploads)]
+                sent += 1
+
+                start = time.perf_counter()
+                try:
+                    response = await client.post(url, files={"file": ("label.jpg", contents, "image/jpeg")})
+                    statuses[response.status_code] += 1
+                    if response.status_code == 200 and args.endpoint == "/analyze-label":
+                        outcomes["success" if response.json().get("success") else "failed"] += 1
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+        elapsed = time.perf_counter() - started
+
+    return latencies, statuses, outcomes, elapsed
+
+
+def report(latencies, statuses, outcomes, elapsed, concurrency):
+    values = np.array(latencies) * 1000
+    result = {
+        "concurrency": concurrency,
+        "requests": len(values),
+        "seconds": round(elapsed, 2),
+        "throughput_per_s": round(len(values) / elapsed, 2) if elapsed else None,
+        "statuses": {str(status): count for status, count in statuses.items()},
+        "outcomes": dict(outcomes),
+    }
+    if len(values):
+        result.update({
+            "p50_ms": round(float(np.percentile(values, 50)), 1),
+            "p95_ms": round(float(np.percentile(values, 95)), 1),
+            "p99_ms": round(float(np.percentile(values, 99)), 1),
+            "max_ms": round(float(values.max()), 1),
+        })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--endpoint", default="/analyze-label", help="upload endpoint to drive")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, help="stop after this many requests")
+    parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request timeout in seconds")
+    parser.add_argument("--image", help="upload this file instead of a synthetic label")
+    parser.add_argument("--resolution", choices=RESOLUTIONS, default="medium", help="size of the synthetic label")
+    parser.add_argument("--unique", action="store_true", help="make every upload distinct to bypass the caches")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+    if not args.requests and not args.duration:
+        args.requests = 100
+
+    uploads = make_uploads(args)
+    latencies, statuses, outcomes, elapsed = asyncio.run(run_load(args, uploads))
+    result = report(latencies, statuses, outcomes, elapsed, args.concurrency)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{result['requests']} requests in {result['seconds']}s at concurrency {args.concurrency}: "
+          f"{result['throughput_per_s']} req/s")
+    if "p50_ms" in result:
+        print(f"latency ms  p50 {result['p50_ms']}  p95 {result['p95_ms']}  p99 {result['p99_ms']}  max {result['max_ms']}")
+    print(f"status codes {result['statuses']}  outcomes {result['outcomes']}")
+
+
+if __name__ == "__main__":
+    main()
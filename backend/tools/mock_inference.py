@@ -0,0 +1,132 @@
+"""Local stand-in for the Hugging Face inference API used by utils.analysis
+
+Serves BART zero-shot classification and Mixtral text generation at
+/models/<org>/<model> with log-normal latencies, "model loading" 503s and
+random 500s, so load tests run offline and reproducibly.
+
+Run from the backend directory, then point the API at it:
+
+    python -m tools.mock_inference --port 8001 --loading-rate 0.05 --error-rate 0.01
+    HF_API_BASE=http://127.0.0.1:8001/models python main.py
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+
+import uvicorn
+from fastapi import FastAPI, Body
+from fastapi.responses import JSONResponse
+
+GENERATED_POINTS = [
+    "Moderate calories per serving with a balanced macronutrient split",
+    "Saturated fat and sodium stay low relative to daily values",
+    "Added sugars make up a noticeable share of the daily value",
+]
+HEALTH_IMPACT = "Fine as part of a balanced diet, but watch the added sugar"
+CONSUMPTION_FREQUENCY = "A few times a week"
+
+
+class MockSettings:
+    """Latency and failure behaviour of the mock, shared by all requests"""
+
+    def __init__(self, classify_latency_ms=150, generate_latency_ms=1500, latency_sigma=0.5,
+                 loading_rate=0.0, error_rate=0.0, seed=None):
+        self.classify_latency_ms = classify_latency_ms
+        self.generate_latency_ms = generate_latency_ms
+        self.latency_sigma = latency_sigma
+        self.loading_rate = loading_rate
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.requests = 0
+
+    def latency(self, median_ms):
+        """Seconds for one call: log-normal around the median, so there is a long tail"""
+        if median_ms <= 0:
+            return 0.0
+        return self.rng.lognormvariate(math.log(median_ms / 1000), self.latency_sigma)
+
+
+def classify(inputs, labels, rng):
+    """Zero-shot response in the shape the real pipeline returns"""
+    first = rng.uniform(0.5, 0.95)
+    order = list(labels)
+    rng.shuffle(order)
+    rest = [(1 - first) / max(1, len(order) - 1)] * (len(order) - 1)
+    return {"sequence": inputs, "labels": order, "scores": [first] + rest}
+
+
+def generate(prompt):
+    """Generation matching whichever of the three analysis prompts was sent"""
+    if "single JSON object" in prompt:
+        text = json.dumps({
+            "explanation": GENERATED_POINTS,
+            "health_impact": HEALTH_IMPACT,
+            "consumption_frequency": CONSUMPTION_FREQUENCY,
+        })
+    elif "Provide two things" in prompt:
+        text = f"- {HEALTH_IMPACT}\n- {CONSUMPTION_FREQUENCY}"
+    else:
+        text = '\n'.join(f"- {point}" for point in GENERATED_POINTS)
+    return [{"generated_text": text}]
+
+
+def create_app(settings):
+    app = FastAPI(title="Mock inference API")
+
+    @app.post("/models/{org}/{model}")
+    async def infer(org: str, model: str, payload: dict = Body(...)):
+        settings.requests += 1
+        parameters = payload.get("parameters") or {}
+        is_classification = "candidate_labels" in parameters
+        median_ms = settings.classify_latency_ms if is_classification else settings.generate_latency_ms
+
+        roll = settings.rng.random()
+        if roll < settings.loading_rate:
+            # The real API answers these quickly, with an estimate of the load time
+            return JSONResponse(
+                status_code=503,
+                content={"error": f"Model {org}/{model} is currently loading", "estimated_time": 20.0},
+            )
+
+        await asyncio.sleep(settings.latency(median_ms))
+        if roll < settings.loading_rate + settings.error_rate:
+            return JSONResponse(status_code=500, content={"error": "Internal server error"})
+
+        if is_classification:
+            return classify(payload.get("inputs", ""), parameters["candidate_labels"], settings.rng)
+        return generate(payload.get("inputs", ""))
+
+    @app.get("/stats")
+    async def stats():
+        return {"requests": settings.requests}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--classify-latency-ms", type=float, default=150, help="median zero-shot latency")
+    parser.add_argument("--generate-latency-ms", type=float, default=1500, help="median generation latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="log-normal spread; 0 for fixed latency")
+    parser.add_argument("--loading-rate", type=float, default=0.0, help="share of calls answered with a 503")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of calls answered with a 500")
+    parser.add_argument("--seed", type=int, help="make latencies and failures reproducible")
+    args = parser.parse_args()
+
+    settings = MockSettings(
+        classify_latency_ms=args.classify_latency_ms,
+        generate_latency_ms=args.generate_latency_ms,
+        latency_sigma=args.latency_sigma,
+        loading_rate=args.loading_rate,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(settings), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,52 +1,52 @@
-import requests
+import json
 import logging
 import os
-import time
+import re
 from dotenv import load_dotenv
+from .backends import get_classifier, get_generator, BACKEND_ERRORS
+from .nutrition_parser import classify_nutrition_text
+from .metrics import span
 
 load_dotenv()
 
-def analyze_text(text, health_profile=None):
-    """Analyze extracted text using BART for classification and Mixtral for detailed analysis"""
-    API_TOKEN = os.getenv("HF_TOKEN")
-    
-    # Use BART for initial classification
-    classification_url = "https://api-inference.huggingface.co/models/facebook/bart-large-mnli"
-    # Use Mixtral for detailed analysis
-    analysis_url = "https://api-inference.huggingface.co/models/mistralai/Mixtral-8x7B-Instruct-v0.1"
-    
-    headers = {
-        "Authorization": f"Bearer {API_TOKEN}",
-        "Content-Type": "application/json"
-    }
-    
-    # Get initial classification based on nutritional values
-    classification_payload = {
-        "inputs": text,
-        "parameters": {
-            "candidate_labels": ["healthy", "unhealthy"]
-        }
-    }
-    
-    logging.debug(f"Sending text to BART model for classification")
-    
-    for attempt in range(3):
-        try:
-            logging.info(f"Attempt {attempt + 1} to get analysis")
-            response = requests.post(classification_url, headers=headers, json=classification_payload)
-            logging.debug(f"Classification response: {response.text}")
-            
-            if response.status_code == 200:
-                result = response.json()
-                
-                if 'scores' in result and 'labels' in result:
-                    verdict = result['labels'][0]
-                    confidence = result['scores'][0]
-                    
-                    # Modify the analysis prompt to include health profile
-                    health_context = ""
-                    if health_profile:
-                        health_context = f"""
+# "local" scores the parsed nutrition table, "remote" always asks the classifier backend,
+# "auto" uses the local scorer whenever enough nutrients were parsed
+INITIAL_CLASSIFIER = os.getenv("INITIAL_CLASSIFIER", "auto").lower()
+
+# "fused" asks the generator for explanation and conclusion in one JSON generation,
+# "sequential" keeps the original explanation-then-conclusion prompts
+ANALYSIS_PROMPT_MODE = os.getenv("ANALYSIS_PROMPT_MODE", "fused").lower()
+
+UNABLE_RESPONSE = """Verdict: Unable to analyze
+Confidence: N/A
+Explanation:
+• Could not process the ingredients
+• Please try with a clearer image
+• Ensure text is readable
+Health Impact: Unable to determine
+Recommended Consumption: Consult with healthcare provider"""
+
+FAILED_RESPONSE = """Verdict: Analysis failed
+Confidence: N/A
+Explanation:
+• Analysis unavailable
+• Please try again with clearer text
+• Make sure ingredients are visible
+Health Impact: Unable to determine
+Recommended Consumption: Consult with healthcare provider"""
+
+# Verdict lines of the canned responses returned when analysis did not complete
+FALLBACK_VERDICTS = ("Verdict: Unable to analyze", "Verdict: Analysis failed")
+
+def is_fallback_analysis(analysis):
+    """True for the placeholder responses, which must never be cached"""
+    return not analysis or analysis.startswith(FALLBACK_VERDICTS)
+
+def build_health_context(health_profile):
+    """Describe the user's health profile for the prompts"""
+    if not health_profile:
+        return ""
+    return f"""
 Consider the following health profile while making recommendations:
 - Age: {health_profile.get('age')} years
 - Weight: {health_profile.get('weight')} kg
@@ -63,8 +63,8 @@ Consider the following health profile while making recommendations:
 - Dietary Restrictions: {health_profile.get('dietaryRestrictions')}
 """
 
-                    # First analysis using Mixtral with focus on nutritional values
-                    analysis_prompt = f"""<s>[INST] You are a skilled nutritionist with expertise in dietary planning and nutrition science. 
+def build_explanation_prompt(text, verdict):
+    return f"""<s>[INST] You are a skilled nutritionist with expertise in dietary planning and nutrition science.
 
 Given this nutrition facts table:
 
@@ -80,48 +80,9 @@ Provide a professional analysis in exactly 3 bullet points explaining why this f
 Base your analysis on standard nutritional guidelines and recommended daily values.
 
 Format your response as bullet points only, without any introduction or conclusion. [/INST]"""
-                    
-                    analysis_payload = {
-                        "inputs": analysis_prompt,
-                        "parameters": {
-                            "max_new_tokens": 200,
-                            "temperature": 0.3,
-                            "top_p": 0.9,
-                            "return_full_text": False
-                        }
-                    }
-                    
-                    explanation_response = requests.post(analysis_url, headers=headers, json=analysis_payload)
-                    logging.debug(f"Explanation response: {explanation_response.text}")
-                    
-                    if explanation_response.status_code == 200:
-                        analysis_result = explanation_response.json()
-                        if isinstance(analysis_result, list) and len(analysis_result) > 0:
-                            generated_text = analysis_result[0]["generated_text"]
-                            
-                            # Process the response into bullet points
-                            points = [line.strip() for line in generated_text.split('\n') 
-                                    if line.strip() and not line.startswith('[')]
-                            
-                            # Clean up the points and ensure proper bullet points
-                            formatted_points = []
-                            for point in points:
-                                # Remove any leading dashes or bullets
-                                point = point.lstrip('- •').strip()
-                                if point and len(point) > 10:  # Ensure meaningful content
-                                    formatted_points.append(f"• {point}")
-                            
-                            # Take first 3 points or pad with defaults if needed
-                            while len(formatted_points) < 3:
-                                if verdict == "healthy":
-                                    formatted_points.append("• Contains balanced nutritional profile with good macro distribution")
-                                else:
-                                    formatted_points.append("• Exceeds recommended values for certain nutrients")
-                            
-                            explanation = '\n'.join(formatted_points[:3])
-                            
-                            # Modify the conclusion prompt to include health profile
-                            conclusion_prompt = f"""<s>[INST] As a nutritionist, based on this nutritional analysis and the following health profile:
+
+def build_conclusion_prompt(explanation, health_context):
+    return f"""<s>[INST] As a nutritionist, based on this nutritional analysis and the following health profile:
 
 {health_context}
 
@@ -134,62 +95,78 @@ Provide two things:
 This is the health profile: {health_context}
 
 Format as two short bullet points. [/INST]"""
-                            
-                            try:
-                                conclusion_payload = {
-                                    "inputs": conclusion_prompt,
-                                    "parameters": {
-                                        "max_new_tokens": 100,
-                                        "temperature": 0.3,
-                                        "top_p": 0.9,
-                                        "return_full_text": False
-                                    }
-                                }
-                                
-                                conclusion_response = requests.post(analysis_url, headers=headers, json=conclusion_payload)
-                                logging.debug(f"Conclusion response: {conclusion_response.text}")
-                                
-                                # Default values
-                                health_impact = "Impact depends on overall diet and individual nutritional needs"
-                                consumption_freq = "Moderate consumption recommended" if verdict == "unhealthy" else "Can be included in regular diet"
-                                
-                                if conclusion_response.status_code == 200:
-                                    conclusion_result = conclusion_response.json()
-                                    if (isinstance(conclusion_result, list) and 
-                                        len(conclusion_result) > 0 and 
-                                        conclusion_result[0].get("generated_text")):
-                                        
-                                        conclusion_text = conclusion_result[0]["generated_text"]
-                                        # Split on newlines and clean up
-                                        conclusion_points = [p.strip().lstrip('- •') for p in conclusion_text.split('\n') 
-                                                           if p.strip() and not p.startswith('[')]
-                                        
-                                        # Get health impact and consumption frequency
-                                        if conclusion_points:
-                                            health_impact = conclusion_points[0]
-                                            if len(conclusion_points) > 1:
-                                                consumption_freq = conclusion_points[1]
-
-                                            # Final classification pass using the health impact and consumption frequency
-                                            final_classification_payload = {
-                                                "inputs": f"{health_impact}\n{consumption_freq}",
-                                                "parameters": {
-                                                    "candidate_labels": ["healthy", "unhealthy"]
-                                                }
-                                            }
-                                            
-                                            final_response = requests.post(classification_url, headers=headers, json=final_classification_payload)
-                                            if final_response.status_code == 200:
-                                                final_result = final_response.json()
-                                                if 'scores' in final_result and 'labels' in final_result:
-                                                    verdict = final_result['labels'][0]
-                                                    confidence = final_result['scores'][0]
-                            
-                            except Exception as e:
-                                logging.error(f"Error in conclusion generation: {str(e)}")
-                                # Keep the default values
-                            
-                            formatted_response = f"""Verdict: {verdict.title()}
+
+def build_fused_prompt(text, verdict, health_context):
+    return f"""<s>[INST] You are a skilled nutritionist with expertise in dietary planning and nutrition science.
+
+Given this nutrition facts table:
+
+{text}
+
+{health_context}
+
+This food has been classified as {verdict}. Respond with a single JSON object and nothing else, using exactly these keys:
+- "explanation": a list of exactly 3 short professional bullet points explaining why it is {verdict}, covering caloric content and serving size, macronutrients, key nutrients and daily value percentages
+- "health_impact": a one-line conclusion about potential health effects for this person
+- "consumption_frequency": a specific serving frequency recommendation (daily, weekly, monthly) considering the nutritional content and health conditions
+
+Base your analysis on standard nutritional guidelines and recommended daily values. [/INST]"""
+
+def split_generated_lines(generated_text):
+    """Non-empty lines of a generation, without bullets or echoed [INST] tags"""
+    return [line.strip().lstrip('- •').strip() for line in generated_text.split('\n')
+            if line.strip() and not line.strip().startswith('[')]
+
+def format_explanation(points, verdict):
+    """Keep the meaningful points as bullets and pad to exactly three"""
+    formatted_points = [f"• {point}" for point in points if point and len(point) > 10]
+
+    while len(formatted_points) < 3:
+        if verdict == "healthy":
+            formatted_points.append("• Contains balanced nutritional profile with good macro distribution")
+        else:
+            formatted_points.append("• Exceeds recommended values for certain nutrients")
+
+    return '\n'.join(formatted_points[:3])
+
+def default_conclusion(verdict):
+    """Health impact and consumption frequency used when the model gives none"""
+    health_impact = "Impact depends on overall diet and individual nutritional needs"
+    consumption_freq = "Moderate consumption recommended" if verdict == "unhealthy" else "Can be included in regular diet"
+    return health_impact, consumption_freq
+
+def parse_fused_analysis(generated_text):
+    """Validate a fused generation; returns (points, health_impact, consumption_freq)
+
+    Missing or malformed fields come back as None so callers can fill defaults.
+    """
+    match = re.search(r'\{.*\}', generated_text, re.DOTALL)
+    data = None
+    if match:
+        try:
+            data = json.loads(match.group(0))
+        except ValueError:
+            logging.warning("Fused analysis was not valid JSON")
+    if not isinstance(data, dict):
+        # Treat it as plain bullet points, like the sequential explanation
+        return split_generated_lines(generated_text), None, None
+
+    points = data.get("explanation")
+    if isinstance(points, str):
+        points = split_generated_lines(points)
+    elif isinstance(points, list):
+        points = [str(point).strip().lstrip('- •').strip() for point in points]
+    else:
+        points = []
+
+    def text_field(key):
+        value = data.get(key)
+        return value.strip().lstrip('- •') if isinstance(value, str) and value.strip() else None
+
+    return points, text_field("health_impact"), text_field("consumption_frequency")
+
+def format_analysis(verdict, confidence, explanation, health_impact, consumption_freq):
+    return f"""Verdict: {verdict.title()}
 Confidence: {confidence:.0%}
 Explanation:
 {explanation}
@@ -197,33 +174,122 @@ Health Impact:
 {health_impact}
 Recommended Consumption:
 {consumption_freq}"""
-                    
-                            return formatted_response
-            
-            elif response.status_code == 503:
-                logging.warning("Model is loading... Please wait.")
-                time.sleep(3)
+
+async def analyze_text(text, health_profile=None):
+    """Analyze extracted text using BART for classification and Mixtral for detailed analysis
+
+    The models come from the configured backends (CLASSIFY_BACKEND, GENERATE_BACKEND).
+    """
+    analysis = None
+    async for stage, data in analyze_text_stages(text, health_profile):
+        if stage == "result":
+            analysis = data["analysis"]
+    return analysis
+
+async def analyze_text_stages(text, health_profile=None):
+    """Run the analysis pipeline, yielding (stage, data) as each model call completes
+
+    Stages are "classification", "explanation", "conclusion", "verdict" and
+    finally "result" with the formatted analysis. Model calls retry on their
+    own (see utils.resilience); when a model stays unavailable the result is
+    the canned FAILED_RESPONSE, which is never cached.
+    """
+    # BART (or the configured classifier) for the verdict, Mixtral (or the configured generator) for the text
+    classifier = get_classifier()
+    generator = get_generator()
+    labels = ["healthy", "unhealthy"]
+
+    try:
+        # Get initial classification based on nutritional values
+        local_result = None
+        if INITIAL_CLASSIFIER != "remote":
+            local_result = classify_nutrition_text(text, min_fields=1 if INITIAL_CLASSIFIER == "local" else 3)
+
+        classification = None
+        if local_result is None:
+            logging.debug(f"Sending text to the {classifier.name} classifier")
+            try:
+                with span("classification"):
+                    classification = await classifier.classify(text, labels)
+            except BACKEND_ERRORS as e:
+                logging.warning(f"Classification unavailable: {str(e)}")
+            if classification is None and INITIAL_CLASSIFIER != "remote":
+                # Score whatever nutrients were parsed rather than fail outright
+                local_result = classify_nutrition_text(text, min_fields=1)
+        if local_result is not None:
+            classification = local_result['labels'][0], local_result['scores'][0]
+        if classification is None:
+            yield "result", {"analysis": FAILED_RESPONSE}
+            return
+
+        verdict, confidence = classification
+        yield "classification", {"verdict": verdict, "confidence": confidence}
+
+        health_context = build_health_context(health_profile)
+        health_impact, consumption_freq = default_conclusion(verdict)
+
+        try:
+            if ANALYSIS_PROMPT_MODE == "fused":
+                # One generation returns explanation, impact and frequency together
+                with span("generation"):
+                    generated_text = await generator.generate(build_fused_prompt(text, verdict, health_context), 350)
+                if generated_text is None:
+                    yield "result", {"analysis": FAILED_RESPONSE}
+                    return
+
+                points, fused_impact, fused_freq = parse_fused_analysis(generated_text)
+                explanation = format_explanation(points, verdict)
+                yield "explanation", {"explanation": explanation}
+                conclusion_points = [point for point in (fused_impact, fused_freq) if point]
+                health_impact = fused_impact or health_impact
+                consumption_freq = fused_freq or consumption_freq
             else:
-                logging.warning(f"Attempt {attempt + 1} failed. Retrying...")
-                time.sleep(2)
-        except Exception as e:
-            logging.error(f"Error during analysis: {str(e)}")
-            if attempt == 2:
-                return """Verdict: Unable to analyze
-Confidence: N/A
-Explanation:
-• Could not process the ingredients
-• Please try with a clearer image
-• Ensure text is readable
-Health Impact: Unable to determine
-Recommended Consumption: Consult with healthcare provider"""
-            time.sleep(2)
-    
-    return """Verdict: Analysis failed
-Confidence: N/A
-Explanation:
-• Analysis unavailable
-• Please try again with clearer text
-• Make sure ingredients are visible
-Health Impact: Unable to determine
-Recommended Consumption: Consult with healthcare provider""" 
\ No newline at end of file
+                # First analysis using Mixtral with focus on nutritional values
+                with span("explanation"):
+                    generated_text = await generator.generate(build_explanation_prompt(text, verdict), 200)
+                if generated_text is None:
+                    yield "result", {"analysis": FAILED_RESPONSE}
+                    return
+
+                explanation = format_explanation(split_generated_lines(generated_text), verdict)
+                yield "explanation", {"explanation": explanation}
+
+                conclusion_points = []
+                try:
+                    with span("conclusion"):
+                        conclusion_text = await generator.generate(build_conclusion_prompt(explanation, health_context), 100)
+                    if conclusion_text:
+                        conclusion_points = split_generated_lines(conclusion_text)
+                        if conclusion_points:
+                            health_impact = conclusion_points[0]
+                            if len(conclusion_points) > 1:
+                                consumption_freq = conclusion_points[1]
+                except BACKEND_ERRORS as e:
+                    logging.error(f"Error in conclusion generation: {str(e)}")
+                    # Keep the default values
+        except BACKEND_ERRORS as e:
+            logging.warning(f"Generation unavailable: {str(e)}")
+            yield "result", {"analysis": FAILED_RESPONSE}
+            return
+
+        if conclusion_points:
+            try:
+                # Final classification pass using the health impact and consumption frequency
+                with span("final_classification"):
+                    final = await classifier.classify(f"{health_impact}\n{consumption_freq}", labels)
+                if final is not None:
+                    verdict, confidence = final
+            except BACKEND_ERRORS as e:
+                # The first verdict stands
+                logging.error(f"Error in final classification: {str(e)}")
+
+        yield "conclusion", {
+            "health_impact": health_impact,
+            "consumption_frequency": consumption_freq
+        }
+        yield "verdict", {"verdict": verdict, "confidence": confidence}
+
+        yield "result", {"analysis": format_analysis(verdict, confidence, explanation, health_impact, consumption_freq)}
+    except Exception as e:
+        logging.error(f"Error during analysis: {str(e)}")
+        yield "result", {"analysis": UNABLE_RESPONSE}
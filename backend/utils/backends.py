@@ -0,0 +1,205 @@
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from .inference_client import CLASSIFY_TIMEOUT, GENERATE_TIMEOUT
+from .resilience import call_model, CircuitOpenError
+from .nutrition_parser import classify_nutrition_text
+
+# Which implementation serves each task: "hf", "local" or "stub"
+CLASSIFY_BACKEND = os.getenv("CLASSIFY_BACKEND", "hf").lower()
+GENERATE_BACKEND = os.getenv("GENERATE_BACKEND", "hf").lower()
+
+# Hosted inference API; point it at tools/mock_inference.py for offline load tests
+HF_API_BASE = os.getenv("HF_API_BASE", "https://api-inference.huggingface.co/models").rstrip('/')
+CLASSIFICATION_MODEL = os.getenv("HF_CLASSIFY_MODEL", "facebook/bart-large-mnli")
+GENERATION_MODEL = os.getenv("HF_GENERATE_MODEL", "mistralai/Mixtral-8x7B-Instruct-v0.1")
+
+# Local CPU models, loaded once at startup. A distilled NLI model keeps zero-shot
+# classification well under 100 ms; LOCAL_ONNX=1 runs it through onnxruntime.
+LOCAL_CLASSIFY_MODEL = os.getenv("LOCAL_CLASSIFY_MODEL", "valhalla/distilbart-mnli-12-1")
+LOCAL_GENERATE_MODEL = os.getenv("LOCAL_GENERATE_MODEL", "Qwen/Qwen2.5-0.5B-Instruct")
+LOCAL_ONNX = os.getenv("LOCAL_ONNX", "0") == "1"
+LOCAL_CPU_THREADS = int(os.getenv("LOCAL_CPU_THREADS", "0"))
+
+# Errors that mean "this backend is unavailable right now" rather than a bug
+BACKEND_ERRORS = (CircuitOpenError, httpx.HTTPError)
+
+
+class HFBackend:
+    """Zero-shot classification and generation on the Hugging Face Inference API"""
+
+    name = "hf"
+
+    def __init__(self, api_base=HF_API_BASE, classification_model=CLASSIFICATION_MODEL,
+                 generation_model=GENERATION_MODEL):
+        self.classification_url = f"{api_base}/{classification_model}"
+        self.generation_url = f"{api_base}/{generation_model}"
+
+    def _headers(self):
+        return {
+            "Authorization": f"Bearer {os.getenv('HF_TOKEN')}",
+            "Content-Type": "application/json"
+        }
+
+    async def classify(self, text, labels):
+        """Return (label, score) for the best label, or None on a bad response"""
+        payload = {
+            "inputs": text,
+            "parameters": {
+                "candidate_labels": labels
+            }
+        }
+        response = await call_model(self.classification_url, payload, headers=self._headers(), timeout=CLASSIFY_TIMEOUT)
+        logging.debug(f"Classification response: {response.text}")
+        if response.status_code == 200:
+            result = response.json()
+            if 'scores' in result and 'labels' in result:
+                return result['labels'][0], result['scores'][0]
+        return None
+
+    async def generate(self, prompt, max_new_tokens):
+        """Return the generated text, or None on a bad response"""
+        payload = {
+            "inputs": prompt,
+            "parameters": {
+                "max_new_tokens": max_new_tokens,
+                "temperature": 0.3,
+                "top_p": 0.9,
+                "return_full_text": False
+            }
+        }
+        response = await call_model(self.generation_url, payload, headers=self._headers(), timeout=GENERATE_TIMEOUT)
+        logging.debug(f"Generation response: {response.text}")
+        if response.status_code == 200:
+            result = response.json()
+            if isinstance(result, list) and len(result) > 0 and result[0].get("generated_text") is not None:
+                return result[0]["generated_text"]
+        return None
+
+
+class LocalBackend:
+    """transformers pipelines on the CPU, loaded once and run on one dedicated thread
+
+    Only needs transformers (and optimum[onnxruntime] with LOCAL_ONNX=1) when
+    a task is configured to use it.
+    """
+
+    name = "local"
+
+    def __init__(self, classification_model=LOCAL_CLASSIFY_MODEL, generation_model=LOCAL_GENERATE_MODEL):
+        self.classification_model = classification_model
+        self.generation_model = generation_model
+        self._classifier = None
+        self._generator = None
+        # One thread: the pipelines are not thread-safe and already use every core
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-model")
+
+    def load(self, classify=True, generate=False):
+        from transformers import pipeline
+
+        if LOCAL_CPU_THREADS:
+            import torch
+            torch.set_num_threads(LOCAL_CPU_THREADS)
+
+        if classify and self._classifier is None:
+            if LOCAL_ONNX:
+                from optimum.onnxruntime import ORTModelForSequenceClassification
+                from transformers import AutoTokenizer
+                model = ORTModelForSequenceClassification.from_pretrained(self.classification_model, export=True)
+                tokenizer = AutoTokenizer.from_pretrained(self.classification_model)
+                self._classifier = pipeline("zero-shot-classification", model=model, tokenizer=tokenizer)
+            else:
+                self._classifier = pipeline("zero-shot-classification", model=self.classification_model, device=-1)
+            # The first call pays for lazy initialisation; do it now
+            self._classifier("warm up", candidate_labels=["healthy", "unhealthy"])
+            logging.info(f"Loaded local classifier {self.classification_model}")
+
+        if generate and self._generator is None:
+            self._generator = pipeline("text-generation", model=self.generation_model, device=-1)
+            logging.info(f"Loaded local generator {self.generation_model}")
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: func(*args, **kwargs))
+
+    async def classify(self, text, labels):
+        if self._classifier is None:
+            await self._run(self.load, classify=True)
+        result = await self._run(self._classifier, text, candidate_labels=labels)
+        return result['labels'][0], result['scores'][0]
+
+    async def generate(self, prompt, max_new_tokens):
+        if self._generator is None:
+            await self._run(self.load, classify=False, generate=True)
+        result = await self._run(
+            self._generator, prompt, max_new_tokens=max_new_tokens, do_sample=True,
+            temperature=0.3, top_p=0.9, return_full_text=False
+        )
+        return result[0]["generated_text"] if result else None
+
+
+class StubBackend:
+    """Deterministic answers with no model at all, for tests, demos and load tests"""
+
+    name = "stub"
+
+    # Words in a health-impact line that lean the stub towards "unhealthy"
+    UNHEALTHY_WORDS = ("limit", "moderat", "occasional", "high", "excess", "avoid", "risk")
+
+    async def classify(self, text, labels):
+        result = classify_nutrition_text(text, min_fields=1)
+        if result is not None and result['labels'][0] in labels:
+            return result['labels'][0], result['scores'][0]
+        lowered = text.lower()
+        label = "unhealthy" if any(word in lowered for word in self.UNHEALTHY_WORDS) else "healthy"
+        return (label if label in labels else labels[0]), 0.75
+
+    async def generate(self, prompt, max_new_tokens):
+        points = [
+            "Calories per serving are moderate for a single portion",
+            "Fat, carbohydrate and protein amounts follow standard daily values",
+            "Check the sodium and added sugar daily value percentages",
+        ]
+        health_impact = "Fits a balanced diet when portions are kept moderate"
+        consumption_frequency = "A few times a week"
+        if "single JSON object" in prompt:
+            return json.dumps({
+                "explanation": points,
+                "health_impact": health_impact,
+                "consumption_frequency": consumption_frequency,
+            })
+        if "Provide two things" in prompt:
+            return f"- {health_impact}\n- {consumption_frequency}"
+        return '\n'.join(f"- {point}" for point in points)
+
+
+BACKENDS = {"hf": HFBackend, "local": LocalBackend, "stub": StubBackend}
+_instances = {}
+
+
+def _backend(name):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}', expected one of {', '.join(BACKENDS)}")
+    if name not in _instances:
+        _instances[name] = BACKENDS[name]()
+    return _instances[name]
+
+
+def get_classifier():
+    return _backend(CLASSIFY_BACKEND)
+
+
+def get_generator():
+    return _backend(GENERATE_BACKEND)
+
+
+def load_backends():
+    """Load local models at startup instead of on the first request"""
+    if CLASSIFY_BACKEND == "local" or GENERATE_BACKEND == "local":
+        _backend("local").load(classify=CLASSIFY_BACKEND == "local", generate=GENERATE_BACKEND == "local")
+    logging.info(f"Inference backends: classify={CLASSIFY_BACKEND}, generate={GENERATE_BACKEND}")
@@ -0,0 +1,203 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def hash_bytes(data):
+    """Content address for an uploaded file"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class LRUCache:
+    """In-memory LRU cache whose entries also expire after ttl seconds"""
+
+    def __init__(self, maxsize=1024, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] < time.time():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.time() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
+
+
+class SQLiteCache:
+    """On-disk cache tier that survives restarts"""
+
+    def __init__(self, path, ttl=7 * 24 * 3600):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at >= ?", (key, time.time())
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + self.ttl),
+            )
+            self._conn.commit()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class RedisCache:
+    """Cache tier on a Redis-compatible server (Redis, Valkey, KeyDB, ...)
+
+    Uses the blocking client; TieredCache calls it from a thread.
+    """
+
+    def __init__(self, url, ttl=3600, prefix="eatwise:"):
+        # Only needed when this backend is configured
+        import redis
+
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+
+    def get(self, key):
+        value = self._client.get(self.prefix + key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        # Size-based eviction is left to the server's maxmemory policy
+        self._client.set(self.prefix + key, value, ex=self.ttl)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class TieredCache:
+    """Memory tier in front of an optional shared or on-disk tier whose hits are promoted
+
+    get() and set() are coroutines: the memory tier answers inline, while the
+    SQLite or Redis tier blocks on I/O and so runs in a thread, off the event loop.
+    """
+
+    def __init__(self, memory, disk=None):
+        self.memory = memory
+        self.disk = disk
+
+    async def get(self, key):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = await asyncio.to_thread(self.disk.get, key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    async def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, value)
+
+    def stats(self):
+        memory = self.memory.stats()
+        hits = memory["hits"]
+        stats = {"memory": memory}
+        if self.disk is not None:
+            stats["disk"] = self.disk.stats()
+            hits += stats["disk"]["hits"]
+        # Every lookup touches the memory tier exactly once
+        lookups = memory["hits"] + memory["misses"]
+        stats["hits"] = hits
+        stats["misses"] = lookups - hits
+        stats["hit_ratio"] = hits / lookups if lookups else 0.0
+        return stats
+
+
+def _canonical_profile(health_profile):
+    profile = {k: v for k, v in (health_profile or {}).items() if v not in (None, '', False)}
+    return json.dumps(profile, sort_keys=True, separators=(',', ':'), default=str)
+
+
+def profile_fingerprint(health_profile):
+    """Stable hash of a health profile, to tell analyses apart without keeping the profile"""
+    return hashlib.sha256(_canonical_profile(health_profile).encode('utf-8')).hexdigest()
+
+
+def analysis_cache_key(text, health_profile=None):
+    """Key on whitespace/case-normalized text plus a stable health-profile fingerprint"""
+    canonical_text = ' '.join(text.split()).casefold()
+    fingerprint = _canonical_profile(health_profile)
+    return hashlib.sha256(f"{canonical_text}\x00{fingerprint}".encode('utf-8')).hexdigest()
+
+
+def build_ocr_cache():
+    """OCR text cache configured from OCR_CACHE_SIZE, OCR_CACHE_TTL and OCR_CACHE_DB"""
+    memory = LRUCache(
+        maxsize=int(os.getenv("OCR_CACHE_SIZE", "1024")),
+        ttl=int(os.getenv("OCR_CACHE_TTL", "86400")),
+    )
+    disk = None
+    db_path = os.getenv("OCR_CACHE_DB")
+    if db_path:
+        disk = SQLiteCache(db_path, ttl=int(os.getenv("OCR_CACHE_DISK_TTL", str(30 * 86400))))
+        logging.info(f"OCR cache persisted to {db_path}")
+    return TieredCache(memory, disk)
+
+
+def build_analysis_cache():
+    """Analysis cache; ANALYSIS_CACHE_BACKEND is "memory" (default) or "redis" (uses REDIS_URL)"""
+    ttl = int(os.getenv("ANALYSIS_CACHE_TTL", "21600"))
+    backend = os.getenv("ANALYSIS_CACHE_BACKEND", "memory").lower()
+
+    if backend == "redis":
+        url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        logging.info(f"Analysis cache backed by {url}")
+        # Keep a small local tier so hot products skip the network hop too
+        return TieredCache(LRUCache(maxsize=256, ttl=min(ttl, 300)), RedisCache(url, ttl=ttl))
+
+    return TieredCache(LRUCache(maxsize=int(os.getenv("ANALYSIS_CACHE_SIZE", "2048")), ttl=ttl))
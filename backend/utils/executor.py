@@ -0,0 +1,231 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .image_processing import preprocess_image, extract_text_from_image, extract_text_from_images, OCR_MAX_SIDE
+from .ocr_engine import init_ocr_engines, engine_stats
+from .metrics import span, collect_spans, record_span, reset_peak_rss, peak_rss_bytes, OCR_PEAK_RSS
+from .uploads import open_image
+
+
+class QueueFullError(Exception):
+    """Raised when the OCR admission queue cannot take another job"""
+
+    def __init__(self, retry_after):
+        super().__init__("Server is busy, please retry shortly")
+        self.retry_after = retry_after
+
+
+_executor = None
+_workers = 0
+_max_pending = 0
+_pending = 0
+_avg_seconds = 2.0  # Running average of one OCR job, used for Retry-After
+# Engine load and warm-up timings per worker pid, for the readiness probe
+_worker_timings = {}
+# Seconds a warm worker waits at startup for the others to finish loading
+WARM_UP_TIMEOUT = 600
+# Startup barrier, set in each worker process by its initializer
+_warm_up_barrier = None
+
+
+def _init_worker(barrier):
+    """Give every worker process its own warm OCR engine"""
+    global _warm_up_barrier
+
+    _warm_up_barrier = barrier
+    init_ocr_engines(pool_size=1)
+
+
+def _ping():
+    """Report this worker's pid and engine warm-up timings once its initializer has run
+
+    Waits at the startup barrier so one worker cannot answer two pings; every
+    worker answers exactly one.
+    """
+    _warm_up_barrier.wait(WARM_UP_TIMEOUT)
+    return os.getpid(), engine_stats()["timings"]
+
+
+def ocr_image_bytes(contents):
+    """Decode, preprocess and OCR one uploaded image (runs inside a worker)"""
+    with span("decode"):
+        image = open_image(contents, OCR_MAX_SIDE)
+    with span("preprocess"):
+        processed_image = preprocess_image(image)
+    # Only the preprocessed array is needed from here on
+    image.close()
+    del image
+    return extract_text_from_image(processed_image)
+
+
+def ocr_image_batch(contents_list):
+    """Preprocess and OCR a chunk of uploads on one engine; returns (text, error) per item"""
+    images = []
+    errors = []
+    for contents in contents_list:
+        try:
+            with span("decode"):
+                image = open_image(contents, OCR_MAX_SIDE)
+            with span("preprocess"):
+                images.append(preprocess_image(image))
+            image.close()
+            errors.append(None)
+        except Exception as e:
+            images.append(None)
+            errors.append(f"Could not decode image: {str(e)}")
+
+    texts = iter(extract_text_from_images([image for image in images if image is not None]))
+    return [(None, error) if error else (next(texts), None) for error in errors]
+
+
+def _run_job(func, arg):
+    """Worker entry point: the result, its stage spans and the worker's peak RSS during the job
+
+    The peak is exact in worker processes, which run one job at a time. With
+    OCR_WORKERS=0 it is the whole server's peak and only a rough guide.
+    """
+    measured = reset_peak_rss()
+    result, spans = collect_spans(func, arg)
+    return result, spans, peak_rss_bytes() if measured else None
+
+
+def start_ocr_executor():
+    """Start the OCR workers; OCR_WORKERS=0 keeps OCR in-process on threads
+
+    Blocks until every worker has loaded and warmed up its engine, and does
+    nothing if the workers are already running.
+    """
+    global _executor, _workers, _max_pending, _worker_timings
+
+    if _executor is not None:
+        return
+    workers = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+    queue_size = int(os.getenv("OCR_QUEUE_SIZE", str(max(1, workers) * 4)))
+
+    if workers > 0:
+        context = multiprocessing.get_context("spawn")
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(context.Barrier(workers),),
+        )
+        # Spawn and warm up the workers now rather than on the first uploads
+        try:
+            for future in [executor.submit(_ping) for _ in range(workers)]:
+                pid, timings = future.result()
+                _worker_timings[pid] = timings
+        except Exception:
+            # A failed warm-up leaves the readiness step FAILED; don't leak the half-started pool
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+    else:
+        workers = init_ocr_engines()
+        _worker_timings = {os.getpid(): engine_stats()["timings"]}
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr")
+
+    # Publish the executor only once it is warm, so requests never wait on model loading
+    _workers = workers
+    _max_pending = workers + queue_size
+    _executor = executor
+    logging.info(f"OCR executor ready with {_workers} workers and {queue_size} queue slots")
+
+
+def shutdown_ocr_executor():
+    global _executor, _worker_timings
+
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+        _worker_timings = {}
+
+
+def _retry_after():
+    """Rough number of seconds until a queue slot frees up"""
+    return max(1, int(_avg_seconds * _pending / max(1, _workers)))
+
+
+async def _submit(func, arg):
+    """Run func(arg) on the OCR workers, rejecting work when the queue is full"""
+    global _pending, _avg_seconds
+
+    if _executor is None:
+        # Starting (or failed to start); the readiness step owns startup and the
+        # probe keeps load balancers away, so never load models on the event loop here
+        raise QueueFullError(5)
+
+    if _pending >= _max_pending:
+        raise QueueFullError(_retry_after())
+
+    loop = asyncio.get_running_loop()
+    _pending += 1
+    start = loop.time()
+    try:
+        result, spans, peak_rss = await loop.run_in_executor(_executor, _run_job, func, arg)
+    finally:
+        _pending -= 1
+        elapsed = loop.time() - start
+        _avg_seconds = 0.8 * _avg_seconds + 0.2 * elapsed
+
+    # Worker stages are timed in the worker and recorded here; the rest is queueing and transfer
+    for stage, seconds in spans:
+        record_span(stage, seconds)
+    record_span("ocr_queue", max(0.0, elapsed - sum(seconds for _, seconds in spans)))
+    if peak_rss is not None:
+        OCR_PEAK_RSS.observe(peak_rss)
+        logging.debug(f"OCR job peak RSS {peak_rss / 2 ** 20:.0f} MB")
+    return result
+
+
+async def run_ocr(contents):
+    """Run preprocessing and OCR for one upload off the event loop"""
+    return await _submit(ocr_image_bytes, contents)
+
+
+async def run_ocr_batch(contents_list):
+    """OCR many uploads, split into chunks so every worker gets a share
+
+    Returns a (text, error) pair per upload, in order.
+    """
+    if _executor is None:
+        raise QueueFullError(5)
+
+    max_chunk = int(os.getenv("OCR_BATCH_SIZE", "8"))
+    chunk_size = max(1, min(max_chunk, -(-len(contents_list) // max(1, _workers))))
+    chunks = [contents_list[i:i + chunk_size] for i in range(0, len(contents_list), chunk_size)]
+
+    chunk_results = await asyncio.gather(
+        *[_submit(ocr_image_batch, chunk) for chunk in chunks],
+        return_exceptions=True,
+    )
+
+    results = []
+    for chunk, chunk_result in zip(chunks, chunk_results):
+        if isinstance(chunk_result, QueueFullError):
+            results.extend([(None, str(chunk_result))] * len(chunk))
+        elif isinstance(chunk_result, Exception):
+            results.extend([(None, f"OCR failed: {str(chunk_result)}")] * len(chunk))
+        else:
+            results.extend(chunk_result)
+    return results
+
+
+def warm_up_timings():
+    """Engine load and warm-up seconds, keyed by worker pid"""
+    return dict(_worker_timings)
+
+
+def executor_stats():
+    """Return worker count, current queue depth and free workers"""
+    stats = {
+        "workers": _workers,
+        "pending": _pending,
+        "max_pending": _max_pending,
+        "available": max(0, _workers - _pending) if _executor is not None else 0,
+    }
+    if isinstance(_executor, ThreadPoolExecutor):
+        stats["engines"] = engine_stats()
+    return stats
@@ -0,0 +1,121 @@
+import hashlib
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+from .cache import profile_fingerprint
+from .metrics import span
+
+# Columns returned for each item of a history page; the full text and analysis come from get()
+SUMMARY_COLUMNS = "id, created_at, image_hash, verdict"
+# Client keys shorter than this are too easy to guess to protect anyone's history
+MIN_CLIENT_KEY_LENGTH = 16
+# Relative to the working directory; HISTORY_DB="" keeps no history
+DEFAULT_HISTORY_DB = "eatwise_history.db"
+
+
+def parse_verdict(analysis):
+    """The verdict from the first line of a formatted analysis, e.g. "Healthy" """
+    first_line = (analysis or '').split('\n', 1)[0]
+    if first_line.startswith('Verdict:'):
+        return first_line[len('Verdict:'):].strip()
+    return "Unknown"
+
+
+def client_id(client_key):
+    """Hash of a client's key, so the database never holds keys that would unlock other histories"""
+    if not client_key or len(client_key) < MIN_CLIENT_KEY_LENGTH:
+        return None
+    return hashlib.sha256(client_key.encode('utf-8')).hexdigest()
+
+
+class HistoryStore:
+    """Completed analyses per client, kept on disk so they can be shown again without OCR or model calls
+
+    Each client sees only the results stored under its own key. Results are
+    addressed by random ids, and the health profile is kept as a fingerprint
+    only. The methods block on SQLite; call them from a thread.
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS analyses (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                id TEXT NOT NULL UNIQUE,
+                client TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                image_hash TEXT,
+                extracted_text TEXT NOT NULL,
+                analysis TEXT NOT NULL,
+                verdict TEXT NOT NULL,
+                profile_fingerprint TEXT
+            )
+        """)
+        # Pages are read newest first per client, optionally for one image
+        self._conn.execute("CREATE INDEX IF NOT EXISTS analyses_client ON analyses (client, seq)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS analyses_client_image ON analyses (client, image_hash, seq)")
+        self._conn.commit()
+
+    def add(self, client, image_hash, extracted_text, analysis, health_profile=None):
+        """Record one analysis for a client and return its id"""
+        result_id = secrets.token_urlsafe(16)
+        with span("history_write"), self._lock:
+            self._conn.execute(
+                "INSERT INTO analyses (id, client, created_at, image_hash, extracted_text, analysis, verdict, "
+                "profile_fingerprint) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    result_id, client, time.time(), image_hash, extracted_text, analysis, parse_verdict(analysis),
+                    profile_fingerprint(health_profile) if health_profile else None,
+                ),
+            )
+            self._conn.commit()
+        return result_id
+
+    def get(self, client, result_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, created_at, image_hash, extracted_text, analysis, verdict, profile_fingerprint "
+                "FROM analyses WHERE id = ? AND client = ?",
+                (result_id, client),
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    def page(self, client, limit=20, before=None, image_hash=None):
+        """A client's results newest first, continuing after the result id `before` from the previous page
+
+        Keyset pagination keeps every page an index range scan, however deep
+        the client has scrolled. Returns (items, next_before), where
+        next_before is None on the last page.
+        """
+        conditions, params = ["client = ?"], [client]
+        if before is not None:
+            conditions.append("seq < (SELECT seq FROM analyses WHERE id = ? AND client = ?)")
+            params.extend([before, client])
+        if image_hash:
+            conditions.append("image_hash = ?")
+            params.append(image_hash)
+
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {SUMMARY_COLUMNS} FROM analyses WHERE {' AND '.join(conditions)} ORDER BY seq DESC LIMIT ?",
+                (*params, limit + 1),
+            ).fetchall()
+        items = [dict(row) for row in rows[:limit]]
+        next_before = items[-1]["id"] if len(rows) > limit else None
+        return items, next_before
+
+
+def build_history_store():
+    """History store at HISTORY_DB (eatwise_history.db by default), or None when it is set empty"""
+    path = os.getenv("HISTORY_DB", DEFAULT_HISTORY_DB)
+    if not path:
+        return None
+    logging.info(f"Analysis history stored in {path}")
+    return HistoryStore(path)
@@ -1,111 +1,133 @@
-from PIL import Image, ImageEnhance
+from PIL import Image
 import numpy as np
-from paddleocr import PaddleOCR
 import logging
+import os
+from .ocr_engine import ocr_engine
+from .roi import find_nutrition_panel
+from .layout import boxes_to_array, format_rows
 from .text_cleaning import clean_nutrition_text
+from .metrics import span
+
+# Images narrower than this are upscaled (within OCR_MAX_SIDE), as small text OCRs poorly
+OCR_MIN_WIDTH = 1500
+# Longest side handed to OCR; bigger phone photos only add detection time
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "2400"))
+
+# Crop to the detected nutrition panel before OCR (set OCR_ROI=0 to disable)
+OCR_ROI = os.getenv("OCR_ROI", "1") == "1"
+# A crop that yields fewer confident boxes or nutrient names than this is retried on the full image
+MIN_ROI_BOXES = 5
+MIN_ROI_NUTRIENTS = 2
+NUTRIENT_KEYWORDS = ('calorie', 'energy', 'fat', 'cholesterol', 'sodium', 'salt', 'carb', 'fiber', 'fibre', 'sugar', 'protein')
+
+CONTRAST_FACTOR = 2.5
+SHARPNESS_FACTOR = 2.0
 
 def preprocess_image(image):
-    """Preprocess image for better OCR accuracy"""
+    """Preprocess image for better OCR accuracy, returning a uint8 grayscale array"""
     try:
-        # Convert to grayscale
-        gray = image.convert('L')
-        
-        # Enhance contrast more aggressively
-        enhancer = ImageEnhance.Contrast(gray)
-        enhanced = enhancer.enhance(2.5)  # Increased from 2.0
-        
-        # Enhance sharpness
-        sharp_enhancer = ImageEnhance.Sharpness(enhanced)
-        sharpened = sharp_enhancer.enhance(2.0)
-        
-        # Resize if image is too small (increased minimum size)
-        if sharpened.size[0] < 1500:  # Increased from 1000
-            ratio = 1500 / sharpened.size[0]
-            sharpened = sharpened.resize((int(sharpened.size[0] * ratio), int(sharpened.size[1] * ratio)))
-        
-        return sharpened
+        # Convert to grayscale first (one channel to resample instead of three)
+        if image.mode != 'L':
+            image = image.convert('L')
+
+        # One resample: narrow images grow to OCR_MIN_WIDTH and oversized
+        # photos shrink, but never past OCR_MAX_SIDE on the longest side
+        width, height = image.size
+        scale = min(max(OCR_MIN_WIDTH / width, 1.0), OCR_MAX_SIDE / max(width, height))
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        if scale < 1.0:
+            # Shrink first so every later step touches fewer pixels. Integer box
+            # reduction is the cheapest good-quality downscale, when it leaves
+            # the image wide enough; otherwise box-average to the exact size
+            factor = -(-max(width, height) // OCR_MAX_SIDE)
+            if width // factor >= min(width, OCR_MIN_WIDTH):
+                image = image.reduce(factor)
+            else:
+                image = image.resize(size, Image.BOX)
+
+        # Contrast and sharpening run in place on a single float buffer
+        gray = np.asarray(image, dtype=np.float32)
+
+        # Enhance contrast around the mean, as ImageEnhance.Contrast does
+        mean = int(gray.mean() + 0.5)
+        gray -= mean
+        gray *= CONTRAST_FACTOR
+        gray += mean
+        np.clip(gray, 0, 255, out=gray)
+
+        # Enhance sharpness by pushing away from the SMOOTH-filtered image;
+        # border pixels are left alone like ImageEnhance.Sharpness does
+        if gray.shape[0] > 2 and gray.shape[1] > 2:
+            center = gray[1:-1, 1:-1]
+            smooth = center * 5
+            for dy in (0, 1, 2):
+                for dx in (0, 1, 2):
+                    if dy != 1 or dx != 1:
+                        smooth += gray[dy:dy + center.shape[0], dx:dx + center.shape[1]]
+            smooth /= 13
+            # smooth + factor * (center - smooth), computed in place
+            smooth *= 1 - SHARPNESS_FACTOR
+            smooth += center * SHARPNESS_FACTOR
+            center[...] = smooth
+            np.clip(gray, 0, 255, out=gray)
+
+        processed = gray.astype(np.uint8)
+
+        # Grow small images last, so contrast and sharpening run on the fewer original pixels
+        if scale > 1.0:
+            processed = np.asarray(Image.fromarray(processed).resize(size, Image.BICUBIC))
+
+        return processed
     except Exception as e:
         logging.error(f"Preprocessing Error: {str(e)}")
         return image
 
-def extract_text_from_image(image):
+def run_ocr_with_roi(ocr, img_array):
+    """OCR only the nutrition panel when one is found, else the whole image"""
+    with span("roi"):
+        roi = find_nutrition_panel(img_array) if OCR_ROI else None
+    if roi:
+        top, bottom, left, right = roi
+        with span("ocr"):
+            result = ocr.ocr(np.ascontiguousarray(img_array[top:bottom, left:right]), cls=True)
+        confident = [line[1][0].lower() for line in (result[0] or []) if line[1][1] > 0.5]
+        # Only the amount column of a panel still has plenty of boxes; insist on the names too
+        nutrients = sum(1 for keyword in NUTRIENT_KEYWORDS if any(keyword in text for text in confident))
+        if len(confident) >= MIN_ROI_BOXES and nutrients >= MIN_ROI_NUTRIENTS:
+            return result
+        logging.debug("Nutrition panel crop had too little text, falling back to the full image")
+    with span("ocr"):
+        return ocr.ocr(img_array, cls=True)
+
+def extract_text_from_image(image, ocr=None):
     """Extract text from image using PaddleOCR with improved table structure"""
     try:
-        # Initialize PaddleOCR
-        ocr = PaddleOCR(use_angle_cls=True, lang='en', table=True)
-        
-        # Convert PIL Image to numpy array
-        img_array = np.array(image)
+        # Preprocessed images are already arrays; asarray only copies PIL images
+        img_array = np.asarray(image)
         
-        # Get OCR result with table structure
-        result = ocr.ocr(img_array, cls=True)
+        # Get OCR result with table structure from a warm, pooled engine
+        if ocr is None:
+            with ocr_engine() as ocr:
+                result = run_ocr_with_roi(ocr, img_array)
+        else:
+            result = run_ocr_with_roi(ocr, img_array)
         
-        # Store text with their coordinates
-        text_blocks = []
-        if result[0]:  # Check if results exist
-            for line in result[0]:
-                coordinates = line[0]  # [[x1,y1], [x2,y2], [x3,y3], [x4,y4]]
-                text = line[1][0]  # text content
-                confidence = line[1][1]  # confidence score
-                
-                if confidence > 0.5:  # Filter low confidence predictions
-                    # Get the middle y-coordinate for sorting
-                    y_middle = (coordinates[0][1] + coordinates[2][1]) / 2
-                    # Get the x-coordinate for horizontal positioning
-                    x_start = coordinates[0][0]
-                    
-                    text_blocks.append({
-                        'text': text,
-                        'y': y_middle,
-                        'x': x_start
-                    })
-        
-        # Sort blocks by vertical position first
-        text_blocks.sort(key=lambda x: x['y'])
-        
-        # Group text blocks into rows based on y-coordinate proximity
-        rows = []
-        current_row = []
-        last_y = None
-        y_threshold = 10  # Adjust this value based on your needs
-        
-        for block in text_blocks:
-            if last_y is None or abs(block['y'] - last_y) <= y_threshold:
-                current_row.append(block)
-            else:
-                if current_row:
-                    # Sort each row by x-coordinate
-                    current_row.sort(key=lambda x: x['x'])
-                    rows.append(current_row)
-                current_row = [block]
-            last_y = block['y']
-        
-        if current_row:
-            current_row.sort(key=lambda x: x['x'])
-            rows.append(current_row)
-        
-        # Format rows into structured text
-        formatted_lines = []
-        for row in rows:
-            # Check if this row might be a value-unit pair
-            if len(row) == 2:
-                text1, text2 = row[0]['text'], row[1]['text']
-                # If the second part looks like a unit (g, mg, %, etc.)
-                if any(text2.lower().endswith(unit) for unit in ['g', 'mg', '%']):
-                    formatted_lines.append(f"{text1}: {text2}")
-                else:
-                    formatted_lines.append(' '.join(block['text'] for block in row))
-            else:
-                formatted_lines.append(' '.join(block['text'] for block in row))
-        
-        # Join lines with proper spacing
-        formatted_text = '\n'.join(formatted_lines)
+        # Rebuild rows from box geometry
+        with span("layout"):
+            geometry, texts = boxes_to_array(result[0])
+            formatted_text = format_rows(geometry, texts)
         
         # Clean and validate the extracted text
-        cleaned_text = clean_nutrition_text(formatted_text)
+        with span("text_cleaning"):
+            cleaned_text = clean_nutrition_text(formatted_text)
         
         logging.debug(f"Extracted text: {cleaned_text}")
         return cleaned_text
     except Exception as e:
         logging.error(f"OCR Error: {str(e)}")
-        return None 
\ No newline at end of file
+        return None
+
+def extract_text_from_images(images):
+    """Extract text from several images on one borrowed engine"""
+    with ocr_engine() as ocr:
+        return [extract_text_from_image(image, ocr=ocr) for image in images]
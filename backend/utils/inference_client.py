@@ -0,0 +1,65 @@
+import logging
+import os
+import time
+
+import httpx
+
+from .metrics import MODEL_CALL_SECONDS, MODEL_CALL_BYTES
+
+# Per-call timeouts in seconds; generation is much slower than classification
+CLASSIFY_TIMEOUT = float(os.getenv("HF_CLASSIFY_TIMEOUT", "15"))
+GENERATE_TIMEOUT = float(os.getenv("HF_GENERATE_TIMEOUT", "45"))
+CONNECT_TIMEOUT = float(os.getenv("HF_CONNECT_TIMEOUT", "5"))
+
+_client = None
+
+
+def get_client():
+    """Return the shared keep-alive HTTP/2 client, creating it on first use"""
+    global _client
+
+    if _client is None or _client.is_closed:
+        max_connections = int(os.getenv("HF_MAX_CONNECTIONS", "20"))
+        _client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=60,
+            ),
+            timeout=httpx.Timeout(GENERATE_TIMEOUT, connect=CONNECT_TIMEOUT),
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def post_json(url, payload, headers=None, timeout=None):
+    """POST a JSON payload over the pooled client and return the response
+
+    Latency, status code and bytes of every call are recorded per model.
+    """
+    client = get_client()
+    request_timeout = httpx.Timeout(timeout, connect=CONNECT_TIMEOUT) if timeout else httpx.USE_CLIENT_DEFAULT
+    model = url.rstrip('/').rsplit('/', 1)[-1]
+    start = time.perf_counter()
+    try:
+        response = await client.post(url, json=payload, headers=headers, timeout=request_timeout)
+    except httpx.TimeoutException:
+        MODEL_CALL_SECONDS.labels(model, "timeout").observe(time.perf_counter() - start)
+        raise
+    except httpx.HTTPError:
+        MODEL_CALL_SECONDS.labels(model, "error").observe(time.perf_counter() - start)
+        raise
+
+    MODEL_CALL_SECONDS.labels(model, str(response.status_code)).observe(time.perf_counter() - start)
+    MODEL_CALL_BYTES.labels(model, "sent").inc(len(response.request.content))
+    MODEL_CALL_BYTES.labels(model, "received").inc(len(response.content))
+    logging.debug(f"POST {url} -> {response.status_code} ({response.http_version})")
+    return response
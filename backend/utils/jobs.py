@@ -0,0 +1,337 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from .executor import QueueFullError
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+# How often a worker looks for progress or cancellations made through another worker
+JOB_POLL_INTERVAL = 0.5
+
+
+class Job:
+    """One submitted label: its state, the stages seen so far and the final result"""
+
+    def __init__(self, payload):
+        self.id = uuid.uuid4().hex
+        self.payload = payload
+        self.state = QUEUED
+        self.created_at = time.time()
+        self.finished_at = None
+        self.stages = {}
+        self.events = []
+        self.result = None
+        self.error = None
+        self.task = None
+        self._changed = asyncio.Event()
+
+    def add_event(self, stage, data):
+        self.events.append((stage, data))
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def finish(self, state, result=None, error=None):
+        self.state = state
+        self.result = result
+        self.error = error
+        self.finished_at = time.time()
+        self.add_event(state, {"result": result, "error": error})
+
+    async def wait_for_events(self, seen, timeout=None):
+        """Wait until there are more than `seen` events or the job is finished"""
+        if len(self.events) > seen or self.state in FINISHED_STATES:
+            return
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    @classmethod
+    def from_row(cls, row):
+        """Read-only snapshot of a job that is owned by another worker process"""
+        job = cls(None)
+        job.id = row["id"]
+        job.state = row["state"]
+        job.created_at = row["created_at"]
+        job.finished_at = row["finished_at"]
+        job.stages = json.loads(row["stages"])
+        job.events = [tuple(event) for event in json.loads(row["events"])]
+        job.result = json.loads(row["result"]) if row["result"] else None
+        job.error = row["error"]
+        return job
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "state": self.state,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "stages": self.stages,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobStore:
+    """Job state shared by all worker processes of one server through a SQLite file
+
+    Each job runs in the worker that accepted it, which writes its state and
+    stages here; any worker can then read or cancel it. A job that is
+    already cancelled is never overwritten by its worker.
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                owner INTEGER NOT NULL,
+                state TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                finished_at REAL,
+                stages TEXT NOT NULL,
+                events TEXT NOT NULL,
+                result TEXT,
+                error TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_owner_state ON jobs (owner, state)")
+        self._conn.commit()
+
+    def save(self, job):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, owner, state, created_at, finished_at, stages, events, result, error) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET state = excluded.state, finished_at = excluded.finished_at, "
+                "stages = excluded.stages, events = excluded.events, result = excluded.result, error = excluded.error "
+                "WHERE jobs.state != ?",
+                (
+                    job.id, os.getpid(), job.state, job.created_at, job.finished_at, json.dumps(job.stages),
+                    json.dumps(job.events), json.dumps(job.result) if job.result is not None else None, job.error,
+                    CANCELLED,
+                ),
+            )
+            self._conn.commit()
+
+    def load(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row is not None else None
+
+    def cancel(self, job_id):
+        """Mark another worker's job cancelled; that worker stops it on its next poll"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = Job.from_row(row)
+            if job.state in FINISHED_STATES:
+                return job
+            job.finish(CANCELLED)
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, finished_at = ?, events = ?, error = NULL WHERE id = ?",
+                (job.state, job.finished_at, json.dumps(job.events), job.id),
+            )
+            self._conn.commit()
+        return job
+
+    def cancelled_ids(self):
+        """Jobs of this worker that another worker has cancelled"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE owner = ? AND state = ?", (os.getpid(), CANCELLED)
+            ).fetchall()
+        return [row["id"] for row in rows]
+
+    def purge(self, cutoff):
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE finished_at < ?", (cutoff,))
+            self._conn.commit()
+
+
+class JobManager:
+    """Bounded queue of pipeline jobs drained by a fixed number of worker tasks
+
+    runner(payload) is an async generator of (stage, data) pairs; each stage
+    is kept as a partial result and the "result" stage completes the job.
+    Finished jobs are dropped ttl seconds after they finish. With a JobStore,
+    jobs submitted to one worker process can be polled, streamed and
+    cancelled through any other.
+    """
+
+    def __init__(self, runner, workers=4, max_queued=100, ttl=3600, store=None):
+        self.runner = runner
+        self.workers = workers
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self.store = store
+        self.jobs = {}
+        self._queue = None
+        self._tasks = []
+        self._avg_seconds = 10.0  # Running average of one job, used for Retry-After
+
+    def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        if self.store is not None:
+            self._tasks.append(asyncio.create_task(self._watch_cancellations()))
+        logging.info(f"Job queue ready with {self.workers} workers and {self.max_queued} slots")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for job in self.jobs.values():
+            if job.state not in FINISHED_STATES:
+                if job.task is not None:
+                    job.task.cancel()
+                job.finish(CANCELLED, error="Server is shutting down")
+                await self._save(job)
+
+    async def _save(self, job):
+        if self.store is not None:
+            await asyncio.to_thread(self.store.save, job)
+
+    async def submit(self, payload):
+        """Queue a job and return it, raising QueueFullError when the queue is full"""
+        if not self._tasks:
+            self.start()
+        await self.purge()
+        job = Job(payload)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(max(1, int(self._avg_seconds * self._queue.qsize() / max(1, self.workers))))
+        self.jobs[job.id] = job
+        await self._save(job)
+        return job
+
+    async def get(self, job_id):
+        """The job, from this worker or (with a store) from the one running it; None if unknown"""
+        await self.purge()
+        job = self.jobs.get(job_id)
+        if job is None and self.store is not None:
+            job = await asyncio.to_thread(self.store.load, job_id)
+        return job
+
+    async def wait_for_events(self, job, seen, timeout=None):
+        """Wait until the job has more than `seen` events or is finished; returns its latest state"""
+        if job.id in self.jobs or self.store is None:
+            await job.wait_for_events(seen, timeout)
+            return job
+
+        # Another worker runs it; watch the shared store instead
+        deadline = time.monotonic() + (timeout or 0)
+        while len(job.events) <= seen and job.state not in FINISHED_STATES and time.monotonic() < deadline:
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+            job = await asyncio.to_thread(self.store.load, job.id) or job
+        return job
+
+    async def cancel(self, job_id):
+        """Cancel a queued or running job; returns the job, or None if unknown"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            if self.store is not None:
+                return await asyncio.to_thread(self.store.cancel, job_id)
+            return None
+        if job.state in FINISHED_STATES:
+            return job
+        self._cancel_local(job)
+        await self._save(job)
+        return job
+
+    def _cancel_local(self, job):
+        if job.task is not None:
+            job.task.cancel()
+        job.payload = None
+        job.finish(CANCELLED)
+
+    async def _watch_cancellations(self):
+        while True:
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+            try:
+                cancelled = await asyncio.to_thread(self.store.cancelled_ids)
+            except sqlite3.Error as e:
+                logging.warning(f"Could not read job cancellations: {str(e)}")
+                continue
+            for job_id in cancelled:
+                job = self.jobs.get(job_id)
+                if job is not None and job.state not in FINISHED_STATES:
+                    self._cancel_local(job)
+
+    async def purge(self):
+        """Forget jobs that finished more than ttl seconds ago"""
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self.jobs.items() if job.finished_at and job.finished_at < cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
+        if expired and self.store is not None:
+            await asyncio.to_thread(self.store.purge, cutoff)
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.state == QUEUED:
+                    job.task = asyncio.create_task(self._run(job))
+                    try:
+                        await asyncio.shield(job.task)
+                    except asyncio.CancelledError:
+                        # Only the job was cancelled, unless the worker itself is stopping
+                        if not job.task.cancelled():
+                            raise
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job):
+        job.state = RUNNING
+        await self._save(job)
+        start = time.monotonic()
+        try:
+            async for stage, data in self.runner(job.payload):
+                if stage == "result":
+                    job.finish(SUCCEEDED, result=data)
+                elif stage == "error":
+                    job.finish(FAILED, error=data.get("error"))
+                else:
+                    job.stages[stage] = data
+                    job.add_event(stage, data)
+                await self._save(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Job {job.id} failed: {str(e)}")
+            job.finish(FAILED, error=str(e))
+            await self._save(job)
+        finally:
+            # Drop the upload as soon as it has been processed
+            job.payload = None
+            self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (time.monotonic() - start)
+        if job.state not in FINISHED_STATES:
+            job.finish(FAILED, error="Pipeline ended without a result")
+            await self._save(job)
+
+    def stats(self):
+        states = {}
+        for job in self.jobs.values():
+            states[job.state] = states.get(job.state, 0) + 1
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "max_queued": self.max_queued,
+            "states": states,
+        }
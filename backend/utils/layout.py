@@ -0,0 +1,71 @@
+import numpy as np
+
+# Columns of the box geometry array built by boxes_to_array
+X0, X1, Y_CENTER, HEIGHT, CONFIDENCE = range(5)
+
+# Boxes whose centers are within this fraction of the median text height share a row
+ROW_TOLERANCE = 0.5
+
+UNIT_SUFFIXES = ('g', 'mg', '%')
+
+
+def boxes_to_array(ocr_lines, min_confidence=0.5):
+    """Turn PaddleOCR lines into an (N, 5) float32 geometry array and the matching texts
+
+    Each row holds x0, x1, y_center, height and confidence of one text box.
+    Boxes at or below min_confidence are dropped.
+    """
+    if not ocr_lines:
+        return np.empty((0, 5), dtype=np.float32), []
+
+    quads = np.array([line[0] for line in ocr_lines], dtype=np.float32)  # (N, 4, 2)
+    confidence = np.array([line[1][1] for line in ocr_lines], dtype=np.float32)
+    keep = confidence > min_confidence
+
+    quads = quads[keep]
+    x = quads[:, :, 0]
+    y = quads[:, :, 1]
+    y0, y1 = y.min(axis=1), y.max(axis=1)
+    geometry = np.stack([x.min(axis=1), x.max(axis=1), (y0 + y1) / 2, y1 - y0, confidence[keep]], axis=1)
+    texts = [line[1][0] for line, kept in zip(ocr_lines, keep) if kept]
+    return geometry, texts
+
+
+def group_rows(geometry):
+    """Assign a row index to every box and return (row_ids, reading_order)
+
+    Rows break where consecutive box centers differ by more than a fraction of
+    the median text height, so the grouping holds at any image resolution.
+    """
+    if len(geometry) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    threshold = ROW_TOLERANCE * max(1.0, float(np.median(geometry[:, HEIGHT])))
+    by_y = np.argsort(geometry[:, Y_CENTER], kind='stable')
+    new_row = np.diff(geometry[by_y, Y_CENTER]) > threshold
+
+    row_ids = np.empty(len(geometry), dtype=np.int64)
+    row_ids[by_y] = np.concatenate([[0], np.cumsum(new_row)])
+
+    # Top-to-bottom rows, left-to-right inside each row
+    reading_order = np.lexsort((geometry[:, X0], row_ids))
+    return row_ids, reading_order
+
+
+def format_rows(geometry, texts):
+    """Join each row's boxes into one line, pairing "name: amount" rows"""
+    if len(geometry) == 0:
+        return ''
+
+    row_ids, reading_order = group_rows(geometry)
+    breaks = np.flatnonzero(np.diff(row_ids[reading_order])) + 1
+
+    formatted_lines = []
+    for row in np.split(reading_order, breaks):
+        row_texts = [texts[index] for index in row]
+        # Check if this row might be a value-unit pair
+        if len(row_texts) == 2 and row_texts[1].lower().endswith(UNIT_SUFFIXES):
+            formatted_lines.append(f"{row_texts[0]}: {row_texts[1]}")
+        else:
+            formatted_lines.append(' '.join(row_texts))
+    return '\n'.join(formatted_lines)
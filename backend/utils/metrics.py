@@ -0,0 +1,240 @@
+import contextvars
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, REGISTRY
+from starlette.routing import Match
+
+# Sub-second stages (decode, layout, cleaning) up to slow remote generations
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 45, 90)
+
+STAGE_SECONDS = Histogram(
+    "eatwise_stage_seconds", "Time spent in one pipeline stage", ["stage"], buckets=LATENCY_BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    "eatwise_request_seconds", "HTTP request latency", ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+IN_FLIGHT = Gauge("eatwise_requests_in_flight", "HTTP requests being handled", ["route"])
+
+MODEL_CALL_SECONDS = Histogram(
+    "eatwise_model_call_seconds", "Latency of outbound model calls", ["model", "status"], buckets=LATENCY_BUCKETS
+)
+MODEL_CALL_BYTES = Counter(
+    "eatwise_model_call_bytes", "Bytes sent to and received from model endpoints", ["model", "direction"]
+)
+MODEL_CALL_RETRIES = Counter(
+    "eatwise_model_call_retries", "Model calls that were retried", ["model", "reason"]
+)
+HEDGED_CALLS = Counter(
+    "eatwise_hedged_calls", "Model calls that sent a second, hedged request", ["model"]
+)
+CIRCUIT_OPEN = Gauge("eatwise_circuit_open", "1 while a model's circuit breaker is open", ["model"])
+COALESCED_CALLS = Counter(
+    "eatwise_coalesced_calls", "Calls that joined an identical computation already in flight", ["flight"]
+)
+OCR_PEAK_RSS = Histogram(
+    "eatwise_ocr_peak_rss_bytes", "Peak resident memory of an OCR worker while running one job",
+    buckets=tuple(mb * 1024 * 1024 for mb in (128, 256, 384, 512, 768, 1024, 1536, 2048, 3072, 4096))
+)
+
+# Spans of the current request, as (stage, seconds) pairs
+_trace = contextvars.ContextVar("trace", default=None)
+# Set inside OCR workers, whose spans are shipped back to the server process
+_worker_spans = contextvars.ContextVar("worker_spans", default=None)
+
+
+def record_span(stage, seconds):
+    """Record one finished stage on the histogram and the current request trace"""
+    worker_spans = _worker_spans.get()
+    if worker_spans is not None:
+        # Worker process metrics never reach /metrics; the caller records these
+        worker_spans.append((stage, seconds))
+        return
+
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    trace = _trace.get()
+    if trace is not None:
+        trace.append((stage, seconds))
+
+
+@contextmanager
+def span(stage):
+    """Time the enclosed block as one pipeline stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(stage, time.perf_counter() - start)
+
+
+def collect_spans(func, arg):
+    """Run func(arg) and return (result, spans) so another process can record the spans"""
+    spans = []
+    token = _worker_spans.set(spans)
+    try:
+        return func(arg), spans
+    finally:
+        _worker_spans.reset(token)
+
+
+def reset_peak_rss():
+    """Restart the kernel's peak-RSS counter for this process (Linux only)"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_bytes():
+    """Peak resident memory of this process since the last reset_peak_rss(), or None"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def process_memory():
+    """Resident memory of this process split into shared and private pages (Linux only)
+
+    Workers forked from a preloading master share the model pages until
+    they write to them; "private" is what each extra worker really costs and
+    "pss" spreads the shared pages evenly over the processes using them.
+    """
+    fields = {}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    except OSError:
+        return None
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+        "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def start_trace():
+    """Start collecting the spans of one request; returns a token for end_trace"""
+    return _trace.set([])
+
+
+def end_trace(token, description, seconds):
+    """Log the per-stage breakdown of a request and stop collecting"""
+    trace = _trace.get()
+    _trace.reset(token)
+    if trace:
+        breakdown = ', '.join(f"{stage}={stage_seconds * 1000:.0f}ms" for stage, stage_seconds in trace)
+        logging.info(f"{description} took {seconds * 1000:.0f}ms: {breakdown}")
+
+
+class RequestMetricsMiddleware:
+    """Time every request, count in-flight requests and log a per-stage breakdown
+
+    A plain ASGI middleware, so a streamed response (SSE, NDJSON) counts as
+    in flight and is timed until its last body chunk is sent, not until its
+    headers are.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Route templates keep the label set small; unmatched paths share one label
+        route = next((r.path for r in scope["app"].routes if r.matches(scope)[0] == Match.FULL), "unmatched")
+        token = start_trace()
+        start = time.perf_counter()
+        status = 500
+        end = None
+
+        async def timed_send(message):
+            nonlocal status, end
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                end = time.perf_counter()
+
+        IN_FLIGHT.labels(route).inc()
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            IN_FLIGHT.labels(route).dec()
+            elapsed = (end or time.perf_counter()) - start
+            REQUEST_SECONDS.labels(scope["method"], route, str(status)).observe(elapsed)
+            end_trace(token, f"{scope['method']} {route} {status}", elapsed)
+
+
+class StatsCollector:
+    """Expose cache hit ratios and OCR queue depth, read from their stats() at scrape time"""
+
+    def __init__(self):
+        self.caches = {}
+        self.executor_stats = None
+
+    def collect(self):
+        hits = CounterMetricFamily("eatwise_cache_hits", "Cache lookups that hit", labels=["cache"])
+        misses = CounterMetricFamily("eatwise_cache_misses", "Cache lookups that missed", labels=["cache"])
+        ratio = GaugeMetricFamily("eatwise_cache_hit_ratio", "Share of cache lookups that hit", labels=["cache"])
+        for name, cache in self.caches.items():
+            stats = cache.stats()
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            ratio.add_metric([name], stats["hit_ratio"])
+        yield from (hits, misses, ratio)
+
+        if self.executor_stats is not None:
+            stats = self.executor_stats()
+            yield GaugeMetricFamily("eatwise_ocr_workers", "OCR workers", value=stats["workers"])
+            yield GaugeMetricFamily("eatwise_ocr_pending", "OCR jobs running or queued", value=stats["pending"])
+            yield GaugeMetricFamily("eatwise_ocr_max_pending", "OCR admission limit", value=stats["max_pending"])
+
+        memory = process_memory()
+        if memory is not None:
+            family = GaugeMetricFamily(
+                "eatwise_process_memory_bytes", "Resident memory of the worker that answered", labels=["pid", "kind"]
+            )
+            for kind, value in memory.items():
+                family.add_metric([str(os.getpid()), kind], value)
+            yield family
+
+
+_stats_collector = StatsCollector()
+REGISTRY.register(_stats_collector)
+
+
+def register_cache(name, cache):
+    """Report a TieredCache's hits, misses and hit ratio on /metrics"""
+    _stats_collector.caches[name] = cache
+
+
+def register_executor(stats_func):
+    """Report OCR worker count and queue depth on /metrics"""
+    _stats_collector.executor_stats = stats_func
+
+
+def metrics_registry():
+    """Registry for /metrics: this process, or every worker when PROMETHEUS_MULTIPROC_DIR is set"""
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    # Cache, queue and memory figures are read live, so they come from the worker that answered
+    registry.register(_stats_collector)
+    return registry
@@ -0,0 +1,181 @@
+import logging
+import re
+from dataclasses import dataclass, fields, asdict
+from typing import Optional
+
+# FDA reference daily values used for the %DV thresholds
+DAILY_VALUES = {
+    'total_fat_g': 78,
+    'saturated_fat_g': 20,
+    'cholesterol_mg': 300,
+    'sodium_mg': 2300,
+    'total_carbohydrate_g': 275,
+    'dietary_fiber_g': 28,
+    'added_sugars_g': 50,
+    'protein_g': 50,
+}
+
+# A serving at or above 20% DV is "high", at or below 5% DV is "low"
+HIGH_DV = 0.20
+LOW_DV = 0.05
+
+
+@dataclass
+class NutritionFacts:
+    """Per-serving nutrients with units normalized to g, mg and kcal"""
+    serving_size_g: Optional[float] = None
+    calories_kcal: Optional[float] = None
+    total_fat_g: Optional[float] = None
+    saturated_fat_g: Optional[float] = None
+    trans_fat_g: Optional[float] = None
+    cholesterol_mg: Optional[float] = None
+    sodium_mg: Optional[float] = None
+    total_carbohydrate_g: Optional[float] = None
+    dietary_fiber_g: Optional[float] = None
+    total_sugars_g: Optional[float] = None
+    added_sugars_g: Optional[float] = None
+    protein_g: Optional[float] = None
+
+    def known_fields(self):
+        return sum(1 for field in fields(self) if getattr(self, field.name) is not None)
+
+    def to_dict(self):
+        return {key: value for key, value in asdict(self).items() if value is not None}
+
+
+# Label names per field, most specific first so "Saturated Fat" never lands in total fat
+_FIELD_PATTERNS = [
+    ('added_sugars_g', r'(?:incl(?:udes|\.)?\s*)?(?:[\d.]+\s*[a-z]*\s*)?added\s+sugars?'),
+    ('total_sugars_g', r'(?:total\s+)?sugars?'),
+    ('saturated_fat_g', r'sat(?:urated|\.)?\s+fat'),
+    ('trans_fat_g', r'trans\s+fat'),
+    ('total_fat_g', r'(?:total\s+)?fat'),
+    ('cholesterol_mg', r'cholesterol'),
+    ('sodium_mg', r'sodium'),
+    ('salt_g', r'salt'),
+    ('dietary_fiber_g', r'(?:dietary\s+)?fib(?:er|re)'),
+    ('total_carbohydrate_g', r'(?:total\s+)?carb(?:ohydrates?|s)?\.?'),
+    ('protein_g', r'protein'),
+    ('calories_kcal', r'calories|energy'),
+    ('serving_size_g', r'serving\s+size'),
+]
+_FIELD_REGEXES = [(name, re.compile(r'^\s*' + pattern + r'\b', re.IGNORECASE)) for name, pattern in _FIELD_PATTERNS]
+
+# "1,820" groups thousands; only a 1-2 digit comma group ("1,5") is a decimal comma
+_NUMBER = r'\d{1,3}(?:,\d{3})+(?:\.\d+)?(?!\d)|\d+(?:,\d{1,2}(?!\d)|\.\d+)?'
+_AMOUNT = re.compile(r'(<\s*)?(' + _NUMBER + r')\s*(mcg|µg|ug|mg|kcal|kj|cal|g|ml)?\b(?!\s*%)', re.IGNORECASE)
+_THOUSANDS = re.compile(r',\d{3}')
+_GRAMS_IN_PARENS = re.compile(r'\((\d+(?:\.\d+)?)\s*(g|ml)\)', re.IGNORECASE)
+
+# Multipliers from the unit found on the label to the unit of each field
+_TO_GRAMS = {'g': 1, 'mg': 0.001, 'mcg': 1e-6, 'µg': 1e-6, 'ug': 1e-6, 'ml': 1}
+_TO_MILLIGRAMS = {'g': 1000, 'mg': 1, 'mcg': 0.001, 'µg': 0.001, 'ug': 0.001}
+
+
+def _parse_number(text):
+    if _THOUSANDS.search(text):
+        return float(text.replace(',', ''))
+    return float(text.replace(',', '.'))
+
+
+def _normalize(field, value, unit):
+    unit = (unit or '').lower()
+    if field == 'calories_kcal':
+        return value / 4.184 if unit == 'kj' else value
+    if field.endswith('_mg'):
+        return value * _TO_MILLIGRAMS.get(unit or 'mg', 1)
+    return value * _TO_GRAMS.get(unit or 'g', 1)
+
+
+def parse_nutrition_facts(text):
+    """Parse cleaned OCR text (see clean_nutrition_text) into a NutritionFacts record"""
+    facts = NutritionFacts()
+    if not text:
+        return facts
+
+    for line in text.split('\n'):
+        for field, regex in _FIELD_REGEXES:
+            match = regex.match(line)
+            if not match:
+                continue
+            rest = line[match.end():]
+
+            if field == 'serving_size_g':
+                # "Serving Size 1 cup (228g)" - the metric amount is in parentheses
+                grams = _GRAMS_IN_PARENS.search(rest)
+                if grams:
+                    facts.serving_size_g = float(grams.group(1))
+                break
+            if field == 'calories_kcal' and re.match(r'\s*from\b', rest, re.IGNORECASE):
+                break  # "Calories from Fat" is not the energy value
+
+            # "Includes 10g Added Sugars" puts the amount before the name
+            amount = _AMOUNT.search(rest) or _AMOUNT.search(match.group(0))
+            if amount:
+                value = _parse_number(amount.group(2))
+                if field == 'salt_g':
+                    # EU labels list salt; sodium is 40% of salt by weight
+                    if facts.sodium_mg is None:
+                        facts.sodium_mg = _normalize('salt_g', value, amount.group(3)) * 400
+                elif getattr(facts, field) is None:
+                    setattr(facts, field, _normalize(field, value, amount.group(3)))
+            break
+
+    return facts
+
+
+def score_nutrition(facts):
+    """Rule-based healthy/unhealthy score from %DV thresholds; below zero is unhealthy"""
+    score = 0.0
+
+    def dv(field):
+        value = getattr(facts, field)
+        return None if value is None else value / DAILY_VALUES[field]
+
+    # Nutrients to limit
+    for field in ('saturated_fat_g', 'sodium_mg', 'added_sugars_g', 'cholesterol_mg', 'total_fat_g'):
+        ratio = dv(field)
+        if ratio is None:
+            continue
+        if ratio >= HIGH_DV:
+            score -= 2 if field != 'total_fat_g' else 1
+        elif ratio <= LOW_DV:
+            score += 0.5
+
+    if facts.added_sugars_g is None and facts.total_sugars_g is not None:
+        # Without an added-sugars line fall back to total sugars against the same DV
+        ratio = facts.total_sugars_g / DAILY_VALUES['added_sugars_g']
+        score += -2 if ratio >= HIGH_DV else 0.5 if ratio <= LOW_DV else 0
+
+    if facts.trans_fat_g:
+        score -= 2
+    if facts.calories_kcal is not None:
+        if facts.calories_kcal >= 400:
+            score -= 1
+        elif facts.calories_kcal <= 100:
+            score += 0.5
+
+    # Nutrients to get enough of
+    for field in ('dietary_fiber_g', 'protein_g'):
+        ratio = dv(field)
+        if ratio is not None and ratio >= HIGH_DV:
+            score += 1
+
+    return score
+
+
+def classify_nutrition_text(text, min_fields=3):
+    """Local stand-in for the zero-shot classifier
+
+    Returns a {"labels": [...], "scores": [...]} dict shaped like the BART
+    response, or None when too few nutrients could be parsed to judge.
+    """
+    facts = parse_nutrition_facts(text)
+    if facts.known_fields() < min_fields:
+        return None
+
+    score = score_nutrition(facts)
+    verdict, other = ("unhealthy", "healthy") if score < 0 else ("healthy", "unhealthy")
+    confidence = min(0.95, 0.55 + 0.1 * abs(score))
+    logging.debug(f"Local classification {verdict} ({score:+.1f}) from {facts.to_dict()}")
+    return {"labels": [verdict, other], "scores": [confidence, 1 - confidence]}
@@ -0,0 +1,135 @@
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+# Same options the per-request engine used to be built with
+OCR_OPTIONS = {
+    'use_angle_cls': True,
+    'lang': 'en',
+    'table': True,
+    # Text crops recognized per forward pass; dense labels have dozens of boxes
+    'rec_batch_num': int(os.getenv("OCR_REC_BATCH", "16")),
+}
+
+_pool = None
+_pool_size = 0
+_engines = []
+# Set when the engines were loaded without a warm-up, e.g. in a preloading master
+_cold = False
+_pool_lock = threading.Lock()
+# Load and warm-up seconds of each engine in the pool, for the readiness probe
+_engine_timings = []
+
+
+def _default_pool_size():
+    return max(1, int(os.getenv("OCR_POOL_SIZE", "1")))
+
+
+def _create_engine():
+    """Load the detection, angle-classification and recognition models"""
+    # Imported here so modules that only preprocess do not pull in paddle
+    from paddleocr import PaddleOCR
+
+    options = dict(OCR_OPTIONS)
+    # Intra-op threads per engine; keep workers x threads at or below the core count
+    if os.getenv("OCR_CPU_THREADS"):
+        options['cpu_threads'] = int(os.getenv("OCR_CPU_THREADS"))
+    return PaddleOCR(**options)
+
+
+def _warm_up(engine):
+    """Run one inference on a synthetic label so the first real request is not slow"""
+    image = Image.new('RGB', (320, 96), 'white')
+    draw = ImageDraw.Draw(image)
+    draw.text((10, 20), "Nutrition Facts", fill='black')
+    draw.text((10, 50), "Calories 120", fill='black')
+    engine.ocr(np.array(image), cls=True)
+
+
+def init_ocr_engines(pool_size=None, warm_up=True):
+    """Load a pool of OCR engines once per process and warm each of them up
+
+    Calling it again is cheap; it only warms up engines that were loaded
+    with warm_up=False, such as those a forked worker inherits.
+    """
+    global _pool, _pool_size, _engines, _engine_timings, _cold
+
+    with _pool_lock:
+        if _pool is not None:
+            if warm_up and _cold:
+                for engine, timing in zip(_engines, _engine_timings):
+                    start = time.perf_counter()
+                    _warm_up(engine)
+                    timing["warm_up_seconds"] = round(time.perf_counter() - start, 3)
+                _cold = False
+            return _pool_size
+
+        pool_size = pool_size or _default_pool_size()
+        engines = queue.Queue(maxsize=pool_size)
+        timings = []
+        for index in range(pool_size):
+            start = time.perf_counter()
+            engine = _create_engine()
+            loaded = time.perf_counter()
+            if warm_up:
+                _warm_up(engine)
+            timings.append({
+                "load_seconds": round(loaded - start, 3),
+                "warm_up_seconds": round(time.perf_counter() - loaded, 3) if warm_up else None,
+            })
+            logging.info(f"OCR engine {index + 1}/{pool_size} ready in {time.perf_counter() - start:.2f}s")
+            engines.put(engine)
+
+        _engine_timings = timings
+        _engines = list(engines.queue)
+        _cold = not warm_up
+
+        _pool = engines
+        _pool_size = pool_size
+        return pool_size
+
+
+def shutdown_ocr_engines():
+    """Drop the engine pool so the models can be garbage collected"""
+    global _pool, _pool_size, _engines, _engine_timings
+
+    with _pool_lock:
+        _pool = None
+        _pool_size = 0
+        _engines = []
+        _engine_timings = []
+
+
+@contextmanager
+def ocr_engine(timeout=None):
+    """Borrow a warm OCR engine from the pool and give it back when done"""
+    if _pool is None:
+        # Scripts and tests that never went through app startup
+        init_ocr_engines(pool_size=1, warm_up=False)
+
+    pool = _pool
+    try:
+        engine = pool.get(timeout=timeout)
+    except queue.Empty:
+        raise TimeoutError("No OCR engine became available in time")
+
+    try:
+        yield engine
+    finally:
+        pool.put(engine)
+
+
+def engine_stats():
+    """Return the pool size, how many engines are idle right now and their warm-up timings"""
+    pool = _pool
+    return {
+        "pool_size": _pool_size,
+        "available": pool.qsize() if pool is not None else 0,
+        "timings": _engine_timings,
+    }
@@ -0,0 +1,176 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+
+from .metrics import span
+from .nutrition_parser import NutritionFacts
+
+# Bytes of the product database the OS may map into memory for lookups
+PRODUCT_DB_MMAP = int(os.getenv("PRODUCT_DB_MMAP", str(1024 * 1024 * 1024)))
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS products (
+        id INTEGER PRIMARY KEY,
+        barcode TEXT NOT NULL,
+        name TEXT,
+        name_key TEXT,
+        brand TEXT,
+        facts TEXT NOT NULL
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS products_barcode ON products (barcode);
+"""
+# Built after a bulk import, which is much faster than maintaining them row by row
+INDEXES = """
+    CREATE INDEX IF NOT EXISTS products_name_key ON products (name_key);
+"""
+FTS_SCHEMA = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts
+    USING fts5(name, brand, content='products', content_rowid='id');
+"""
+
+# Label lines for each field, in the order and wording parse_nutrition_facts reads
+LABEL_LINES = [
+    ('calories_kcal', "Calories {:.0f}"),
+    ('total_fat_g', "Total Fat {:.1f}g"),
+    ('saturated_fat_g', "Saturated Fat {:.1f}g"),
+    ('trans_fat_g', "Trans Fat {:.1f}g"),
+    ('cholesterol_mg', "Cholesterol {:.0f}mg"),
+    ('sodium_mg', "Sodium {:.0f}mg"),
+    ('total_carbohydrate_g', "Total Carbohydrate {:.1f}g"),
+    ('dietary_fiber_g', "Dietary Fiber {:.1f}g"),
+    ('total_sugars_g', "Total Sugars {:.1f}g"),
+    ('added_sugars_g', "Added Sugars {:.1f}g"),
+    ('protein_g', "Protein {:.1f}g"),
+]
+
+
+def name_key(name):
+    """Whitespace and case-normalized product name for exact lookups"""
+    return ' '.join((name or '').split()).casefold() or None
+
+
+def barcode_candidates(barcode):
+    """The same code as EAN-13, UPC-A and without leading zeros, since dumps mix them"""
+    digits = re.sub(r'\D', '', barcode or '')
+    if not digits:
+        return []
+    stripped = digits.lstrip('0') or '0'
+    return list(dict.fromkeys([digits, digits.zfill(13), stripped.zfill(12), stripped]))
+
+
+def label_text(facts):
+    """Nutrition facts written out like a cleaned label, so analyze_text treats them as OCR output"""
+    lines = ["Nutrition Facts"]
+    if facts.serving_size_g is not None:
+        lines.append(f"Serving Size {facts.serving_size_g:g}g ({facts.serving_size_g:g}g)")
+    for field, template in LABEL_LINES:
+        value = getattr(facts, field)
+        if value is not None:
+            lines.append(template.format(value))
+    return '\n'.join(lines)
+
+
+def create_schema(conn):
+    conn.executescript(SCHEMA)
+
+
+def has_fts5():
+    try:
+        sqlite3.connect(':memory:').execute("CREATE VIRTUAL TABLE t USING fts5(x)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def create_indexes(conn):
+    """Build the name index and, when SQLite has FTS5, the full-text index over names and brands"""
+    conn.executescript(INDEXES)
+    if has_fts5():
+        conn.executescript(FTS_SCHEMA)
+        conn.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+    conn.execute("ANALYZE")
+    conn.commit()
+
+
+class ProductStore:
+    """Read-only lookups of packaged products by barcode or name in an imported SQLite database
+
+    Built by tools/import_products.py. The file is opened read-only and
+    memory-mapped, so lookups are a few index pages that stay in the page
+    cache, however many millions of products it holds.
+    """
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute(f"PRAGMA mmap_size={PRODUCT_DB_MMAP}")
+        self.has_fts = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'products_fts'"
+        ).fetchone() is not None
+
+    def by_barcode(self, barcode):
+        candidates = barcode_candidates(barcode)
+        if not candidates:
+            return None
+        row = self._conn.execute(
+            f"SELECT * FROM products WHERE barcode IN ({', '.join('?' * len(candidates))}) LIMIT 1",
+            candidates,
+        ).fetchone()
+        return self._product(row, "barcode")
+
+    def by_name(self, name):
+        """Exact (normalized) name match, else the best full-text match on name and brand"""
+        key = name_key(name)
+        if not key:
+            return None
+        row = self._conn.execute("SELECT * FROM products WHERE name_key = ? LIMIT 1", (key,)).fetchone()
+        if row is not None:
+            return self._product(row, "name")
+        if self.has_fts:
+            # Quote every word so user input is never parsed as FTS query syntax
+            query = ' '.join('"{}"'.format(word.replace('"', '')) for word in key.split())
+            row = self._conn.execute(
+                "SELECT products.* FROM products_fts JOIN products ON products.id = products_fts.rowid "
+                "WHERE products_fts MATCH ? ORDER BY rank LIMIT 1",
+                (query,),
+            ).fetchone()
+        return self._product(row, "fuzzy")
+
+    def lookup(self, barcode=None, name=None):
+        """Find a product by barcode, then by name; None when neither is known
+
+        The product's "match" is "barcode", "name" or "fuzzy", the last being
+        a full-text guess that may be a different product.
+        """
+        with span("product_lookup"):
+            product = self.by_barcode(barcode) if barcode else None
+            if product is None and name:
+                product = self.by_name(name)
+        return product
+
+    def _product(self, row, match):
+        if row is None:
+            return None
+        facts = NutritionFacts(**json.loads(row["facts"]))
+        return {
+            "match": match,
+            "barcode": row["barcode"],
+            "name": row["name"],
+            "brand": row["brand"],
+            "nutrition": facts.to_dict(),
+            "label_text": label_text(facts),
+        }
+
+
+def build_product_store():
+    """Product database at PRODUCT_DB, or None when it is not configured or not imported yet"""
+    path = os.getenv("PRODUCT_DB")
+    if not path:
+        return None
+    if not os.path.exists(path):
+        logging.warning(f"PRODUCT_DB {path} does not exist; run tools/import_products.py first")
+        return None
+    logging.info(f"Known products looked up in {path}")
+    return ProductStore(path)
@@ -0,0 +1,43 @@
+import asyncio
+import logging
+import time
+
+LOADING, READY, FAILED = "loading", "ready", "failed"
+
+
+class Readiness:
+    """Startup steps (model loading, warm-up) that must finish before traffic is sent here
+
+    Steps run in a background task so the process answers liveness probes
+    immediately, while the readiness probe keeps failing until every step
+    has completed.
+    """
+
+    def __init__(self, *names):
+        self.steps = {name: {"state": LOADING, "seconds": None, "error": None} for name in names}
+
+    async def run_step(self, name, func):
+        """Run a blocking startup function off the event loop and record how it went"""
+        step = self.steps.setdefault(name, {"state": LOADING, "seconds": None, "error": None})
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(func)
+        except Exception as e:
+            step.update(state=FAILED, error=str(e))
+            logging.exception(f"Startup step {name} failed")
+        else:
+            step["state"] = READY
+            logging.info(f"Startup step {name} finished in {time.perf_counter() - start:.1f}s")
+        finally:
+            step["seconds"] = round(time.perf_counter() - start, 3)
+
+    @property
+    def ready(self):
+        return all(step["state"] == READY for step in self.steps.values())
+
+    def failed(self, name):
+        """Whether the step has failed; it stays failed until the process restarts"""
+        return name in self.steps and self.steps[name]["state"] == FAILED
+
+    def report(self):
+        return {name: dict(step) for name, step in self.steps.items()}
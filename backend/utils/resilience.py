@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+
+import httpx
+
+from .inference_client import post_json
+from .metrics import MODEL_CALL_RETRIES, HEDGED_CALLS, CIRCUIT_OPEN
+
+# Attempts per model call, including the first
+MAX_ATTEMPTS = int(os.getenv("HF_MAX_ATTEMPTS", "3"))
+# Full-jitter exponential backoff: sleep a random time up to base * 2**retry, capped
+BACKOFF_BASE = float(os.getenv("HF_BACKOFF_BASE", "0.5"))
+BACKOFF_CAP = float(os.getenv("HF_BACKOFF_CAP", "8"))
+# Retries may add at most this share of extra calls on top of first attempts
+RETRY_BUDGET_RATIO = float(os.getenv("HF_RETRY_BUDGET_RATIO", "0.2"))
+RETRY_BUDGET_MAX = float(os.getenv("HF_RETRY_BUDGET_MAX", "10"))
+# Consecutive failures that open a model's circuit, and seconds before it is tried again
+BREAKER_THRESHOLD = int(os.getenv("HF_BREAKER_THRESHOLD", "5"))
+BREAKER_RESET = float(os.getenv("HF_BREAKER_RESET", "30"))
+# Send a second request when the first is slower than this latency percentile (0 disables)
+HEDGE_PERCENTILE = float(os.getenv("HF_HEDGE_PERCENTILE", "0"))
+HEDGE_MIN_SAMPLES = 20
+
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a model whose circuit is open"""
+
+    def __init__(self, model, retry_in):
+        super().__init__(f"{model} is unavailable, retrying in {retry_in:.0f}s")
+        self.model = model
+
+
+class RetryBudget:
+    """Token bucket shared by all model calls that caps retries during an outage
+
+    Every first attempt earns `ratio` of a token and every retry or hedge
+    spends a whole one, so a failing provider sees at most (1 + ratio) times
+    the normal call volume instead of MAX_ATTEMPTS times.
+    """
+
+    def __init__(self, ratio=RETRY_BUDGET_RATIO, max_tokens=RETRY_BUDGET_MAX):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+
+    def deposit(self):
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class CircuitBreaker:
+    """Per-model breaker: opens after consecutive failures, lets one trial call through after a pause"""
+
+    def __init__(self, model, threshold=BREAKER_THRESHOLD, reset_timeout=BREAKER_RESET):
+        self.model = model
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go out now"""
+        if self.opened_at is None:
+            return
+        waited = time.monotonic() - self.opened_at
+        if waited < self.reset_timeout or self._trial_running:
+            raise CircuitOpenError(self.model, max(0.0, self.reset_timeout - waited))
+        # Half-open: this call decides whether the circuit closes again
+        self._trial_running = True
+
+    def cancel_trial(self):
+        self._trial_running = False
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logging.info(f"Circuit for {self.model} closed")
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        CIRCUIT_OPEN.labels(self.model).set(0)
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_running = False
+        if self.failures >= self.threshold:
+            if self.opened_at is None:
+                logging.warning(f"Circuit for {self.model} opened after {self.failures} failures")
+            self.opened_at = time.monotonic()
+            CIRCUIT_OPEN.labels(self.model).set(1)
+
+
+class LatencyTracker:
+    """Recent successful call latencies of one model, for the hedging delay"""
+
+    def __init__(self, size=200):
+        self.samples = deque(maxlen=size)
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, percentile):
+        if len(self.samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+
+_budget = RetryBudget()
+_breakers = {}
+_latencies = {}
+
+
+def _model_name(url):
+    return url.rstrip('/').rsplit('/', 1)[-1]
+
+
+def breaker_for(model):
+    if model not in _breakers:
+        _breakers[model] = CircuitBreaker(model)
+    return _breakers[model]
+
+
+def backoff_delay(retry, response=None):
+    """Seconds to wait before retry number `retry` (0-based)"""
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** retry))
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        delay = max(delay, min(BACKOFF_CAP, float(retry_after)))
+    return delay
+
+
+async def _first_success(tasks):
+    """Result of whichever task succeeds first; the other is cancelled"""
+    pending = set(tasks)
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _send(url, payload, headers, timeout, model):
+    """One attempt, hedged with a second request if it is slower than usual"""
+    tracker = _latencies.setdefault(model, LatencyTracker())
+    hedge_after = tracker.percentile(HEDGE_PERCENTILE) if HEDGE_PERCENTILE else None
+    start = time.monotonic()
+
+    first = asyncio.ensure_future(post_json(url, payload, headers=headers, timeout=timeout))
+    if hedge_after is None:
+        response = await first
+    else:
+        try:
+            done, _ = await asyncio.wait({first}, timeout=hedge_after)
+        except asyncio.CancelledError:
+            first.cancel()
+            raise
+        if done or not _budget.withdraw():
+            response = await first
+        else:
+            HEDGED_CALLS.labels(model).inc()
+            second = asyncio.ensure_future(post_json(url, payload, headers=headers, timeout=timeout))
+            response = await _first_success([first, second])
+
+    if response.status_code == 200:
+        tracker.add(time.monotonic() - start)
+    return response
+
+
+async def call_model(url, payload, headers=None, timeout=None):
+    """POST to a model endpoint with retries, a shared retry budget and a circuit breaker
+
+    Returns the last response, which callers check for status 200. Raises
+    CircuitOpenError without calling out when the model has been failing,
+    and the transport error when every attempt failed without a response.
+    """
+    model = _model_name(url)
+    breaker = breaker_for(model)
+    _budget.deposit()
+
+    for attempt in range(MAX_ATTEMPTS):
+        breaker.before_call()
+        response = None
+        try:
+            response = await _send(url, payload, headers, timeout, model)
+        except httpx.HTTPError as e:
+            breaker.record_failure()
+            reason = "timeout" if isinstance(e, httpx.TimeoutException) else "transport_error"
+            if attempt == MAX_ATTEMPTS - 1 or not _budget.withdraw():
+                raise
+            logging.warning(f"{model} call failed ({reason}), retrying")
+        except asyncio.CancelledError:
+            # Not the model's fault; let a half-open circuit try again
+            breaker.cancel_trial()
+            raise
+        else:
+            if response.status_code not in RETRYABLE_STATUS:
+                # Other 4xx errors (bad token, bad payload) will not improve with retries
+                breaker.record_success()
+                return response
+            breaker.record_failure()
+            reason = "model_loading" if response.status_code == 503 else f"status_{response.status_code}"
+            if attempt == MAX_ATTEMPTS - 1 or not _budget.withdraw():
+                return response
+            logging.warning(f"{model} answered {response.status_code}, retrying")
+
+        MODEL_CALL_RETRIES.labels(model, reason).inc()
+        await asyncio.sleep(backoff_delay(attempt, response))
+
+
+def resilience_stats():
+    return {
+        "retry_budget": round(_budget.tokens, 2),
+        "circuits": {
+            model: "open" if breaker.opened_at is not None else "closed"
+            for model, breaker in _breakers.items()
+        },
+    }
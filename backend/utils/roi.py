@@ -0,0 +1,140 @@
+import logging
+
+import numpy as np
+
+# Width the ruling search runs at; rules survive this much downscaling
+ROI_SEARCH_WIDTH = 600
+# A horizontal rule spans at least this share of the search image width
+MIN_RULE_FRACTION = 0.15
+# Nutrition panels have a stack of rules (header bar, thin separators, footer)
+MIN_RULES = 4
+# Cropping only pays off when it removes a meaningful part of the frame
+MAX_ROI_AREA = 0.8
+MIN_ROI_AREA = 0.02
+# Photo tilt, in degrees either way, that the rule search corrects for
+MAX_SKEW_DEGREES = 5.0
+SKEW_STEP_DEGREES = 0.25
+
+
+def _downscale(gray):
+    """Shrink a 2-D array to roughly ROI_SEARCH_WIDTH columns
+
+    Each block keeps the darkest of its rows (averaged across columns) so
+    one-pixel rules are not washed out by the downscale.
+    """
+    factor = max(1, gray.shape[1] // ROI_SEARCH_WIDTH)
+    height = gray.shape[0] // factor * factor
+    width = gray.shape[1] // factor * factor
+    blocks = gray[:height, :width].reshape(height // factor, factor, width // factor, factor)
+    return blocks.min(axis=1).mean(axis=2, dtype=np.float32), factor
+
+
+def _longest_dark_runs(dark):
+    """Per row, the length and end column of the longest run of dark pixels"""
+    counts = np.cumsum(dark, axis=1, dtype=np.int32)
+    # Subtract the count reached at the last light pixel so runs restart at zero
+    resets = np.maximum.accumulate(np.where(dark, 0, counts), axis=1)
+    runs = counts - resets
+    return runs.max(axis=1), runs.argmax(axis=1)
+
+
+def _estimate_skew(dark):
+    """Slope (rows per column) that lines the dark pixels up into the sharpest horizontal rows
+
+    Rules and text baselines concentrate into few rows once the tilt is
+    undone, which maximizes the sum of squared row counts.
+    """
+    ys, xs = np.nonzero(dark)
+    if len(ys) == 0:
+        return 0.0
+    best_slope, best_score = 0.0, -1.0
+    for degrees in np.arange(-MAX_SKEW_DEGREES, MAX_SKEW_DEGREES + 1e-9, SKEW_STEP_DEGREES):
+        slope = np.tan(np.radians(degrees))
+        rows = ys - np.rint(xs * slope).astype(np.int64)
+        counts = np.bincount(rows - rows.min())
+        score = float(np.dot(counts, counts))
+        if score > best_score:
+            best_slope, best_score = slope, score
+    return best_slope
+
+
+def _shear(dark, slope):
+    """Shift every column up by slope * x rows so rules tilted by that slope become horizontal
+
+    Returns the sheared mask and the per-column shifts; row y of the result
+    is row y + shift[x] of the input.
+    """
+    shifts = np.rint(np.arange(dark.shape[1]) * slope).astype(np.int64)
+    rows = np.arange(dark.shape[0])[:, None] + shifts[None, :]
+    inside = (rows >= 0) & (rows < dark.shape[0])
+    sheared = np.take_along_axis(dark, np.clip(rows, 0, dark.shape[0] - 1), axis=0) & inside
+    return sheared, shifts
+
+
+def find_nutrition_panel(image):
+    """Locate the ruled nutrition-facts table in a grayscale image
+
+    Returns (top, bottom, left, right) in image coordinates, or None when no
+    convincing stack of horizontal rules is found.
+    """
+    gray = image if image.ndim == 2 else image.mean(axis=2)
+    small, factor = _downscale(gray)
+    if small.shape[0] < 20 or small.shape[1] < 20:
+        return None
+
+    # Rules are the darkest strokes on the label; undo any tilt so each rule is one row
+    dark = small < 0.6 * float(np.median(small))
+    dark, shifts = _shear(dark, _estimate_skew(dark))
+    run_lengths, run_ends = _longest_dark_runs(dark)
+    rule_rows = np.flatnonzero(run_lengths >= MIN_RULE_FRACTION * small.shape[1])
+    if len(rule_rows) < MIN_RULES:
+        return None
+
+    # Solid blocks of package art are not rules: drop dark bands taller than a thick rule
+    band_breaks = np.flatnonzero(np.diff(rule_rows) > 1) + 1
+    max_thickness = max(3, int(0.02 * small.shape[0]))
+    bands = [band for band in np.split(rule_rows, band_breaks) if len(band) <= max_thickness]
+    if len(bands) < MIN_RULES:
+        return None
+    rule_rows = np.concatenate(bands)
+
+    starts = run_ends[rule_rows] - run_lengths[rule_rows] + 1
+    ends = run_ends[rule_rows] + 1
+
+    # Split rules into stacks wherever the vertical gap is too large to be one table
+    max_gap = 0.25 * small.shape[0]
+    breaks = np.flatnonzero(np.diff(rule_rows) > max_gap) + 1
+    best = None
+    for group in np.split(np.arange(len(rule_rows)), breaks):
+        # The rules of one table start at about the same column
+        group = group[np.abs(starts[group] - np.median(starts[group])) <= 0.05 * small.shape[1]]
+        # Consecutive rows of one thick rule count once
+        distinct = 1 + np.count_nonzero(np.diff(rule_rows[group]) > 1) if len(group) else 0
+        if distinct >= MIN_RULES and (best is None or distinct > best[0]):
+            best = (distinct, group)
+    if best is None:
+        return None
+
+    group = best[1]
+    top, bottom = rule_rows[group].min(), rule_rows[group].max()
+    left, right = starts[group].min(), ends[group].max()
+
+    # Back in image rows the tilted panel spans every shift across its columns
+    pad_y = max(4, int(0.08 * (bottom - top)))
+    pad_x = max(4, int(0.03 * (right - left)))
+    top = top + shifts[left:right].min()
+    bottom = bottom + shifts[left:right].max()
+
+    # Leave room for the "Nutrition Facts" title above the first rule and the text margins
+    top = max(0, top - 2 * pad_y)
+    bottom = min(small.shape[0], bottom + pad_y)
+    left = max(0, left - pad_x)
+    right = min(small.shape[1], right + pad_x)
+
+    area = (bottom - top) * (right - left) / (small.shape[0] * small.shape[1])
+    if not MIN_ROI_AREA <= area <= MAX_ROI_AREA:
+        return None
+
+    roi = (int(top * factor), int(bottom * factor), int(left * factor), int(right * factor))
+    logging.debug(f"Nutrition panel found at {roi} ({area:.0%} of the image)")
+    return roi
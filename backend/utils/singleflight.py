@@ -0,0 +1,84 @@
+import asyncio
+from contextlib import contextmanager
+
+from .metrics import COALESCED_CALLS
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one shared computation
+
+    Nothing is kept once a flight lands; results live only as long as some
+    caller is waiting for them, so there is no staleness to manage.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.started = 0
+        self.joined = 0
+        self._flights = {}
+
+    def _land(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Mark a failure as retrieved even if every waiter has gone away
+        if not flight.cancelled():
+            flight.exception()
+
+    def _register(self, key, flight):
+        self.started += 1
+        self._flights[key] = flight
+        flight.add_done_callback(lambda done: self._land(key, done))
+
+    async def do(self, key, func, *args):
+        """Return await func(*args), sharing one run among concurrent callers of key
+
+        The shared run is shielded, so a caller that disconnects does not
+        cancel it for the others. If a leader started with lead() gives up,
+        the waiters start a new flight.
+        """
+        while True:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = asyncio.ensure_future(func(*args))
+                self._register(key, flight)
+            else:
+                self.joined += 1
+                COALESCED_CALLS.labels(self.name).inc()
+            try:
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise
+
+    async def join(self, key):
+        """Wait for the flight on key if there is one; None if there is none or it was abandoned"""
+        flight = self._flights.get(key)
+        if flight is None:
+            return None
+        self.joined += 1
+        COALESCED_CALLS.labels(self.name).inc()
+        try:
+            return await asyncio.shield(flight)
+        except asyncio.CancelledError:
+            if not flight.cancelled():
+                raise
+            return None
+
+    @contextmanager
+    def lead(self, key):
+        """Register a flight the caller completes itself with set_result()
+
+        For callers that need the intermediate stages of the computation (the
+        streaming endpoints). Leaving the block without a result abandons the
+        flight and releases its waiters.
+        """
+        flight = asyncio.get_running_loop().create_future()
+        self._register(key, flight)
+        try:
+            yield flight
+        finally:
+            if not flight.done():
+                flight.cancel()
+
+    def stats(self):
+        return {"in_flight": len(self._flights), "started": self.started, "joined": self.joined}
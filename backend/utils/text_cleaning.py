@@ -1,51 +1,150 @@
+import json
 import logging
+import os
+import re
+
+# Correction table; OCR_CORRECTIONS_FILE can point at a JSON file with extra entries
+CORRECTIONS_FILE = os.path.join(os.path.dirname(__file__), 'ocr_corrections.json')
+
+# Units that may legitimately follow a number on a label
+CANONICAL_UNITS = ('g', 'mg', 'mcg', 'kg', 'kcal', 'kj', 'kJ', 'cal', 'ml', 'mL', 'l', 'L', 'oz', 'IU', '%')
+MASS_UNITS = ('g', 'mg', 'mcg', '%')
+# Amount fixes remembered by compile_normalizer before the memo starts over
+MAX_CACHED_REPLACEMENTS = 4096
+
+
+def load_corrections(extra_file=None):
+    """Load the word, unit and digit correction tables, merging an optional extra file"""
+    with open(CORRECTIONS_FILE, encoding='utf-8') as f:
+        corrections = json.load(f)
+
+    extra_file = extra_file or os.getenv("OCR_CORRECTIONS_FILE")
+    if extra_file:
+        with open(extra_file, encoding='utf-8') as f:
+            for section, entries in json.load(f).items():
+                corrections.setdefault(section, {}).update(entries)
+    return corrections
+
+
+def _alternation(keys):
+    # Longest first so "mcg" is tried before "mg"
+    return '|'.join(re.escape(key) for key in sorted(keys, key=len, reverse=True))
+
+
+def compile_normalizer(corrections):
+    """Compile the correction tables into a single regex and a replacement callback
+
+    Word fixes apply to whole words anywhere. Amounts are a number, possibly
+    with look-alike characters (O, l, |, ...) in it, and an optional unit in
+    either case ("1OOmg", "2.O g", "16OMG", "47 rng"). A look-alike becomes a
+    digit only inside an amount that has a real digit, or when it stands
+    alone before a mass unit ("Og"), so "log", "Oats" or "Iron" are never
+    touched; one that is also a unit stays a unit ("1l", "1.5l"). Unit typos
+    are fixed only after a number.
+
+    Every match starts at a real digit, an upper-case or symbol look-alike at
+    the start of a token, or the first letter of a misspelt word, so the
+    regex engine skips straight between those. Amounts made of digits only
+    must also have a look-alike or a typo ahead to match, so text that
+    needs no fixing never reaches Python. Returns a function that applies
+    all fixes to a string in one pass.
+    """
+    words = corrections.get('words', {})
+    units = corrections.get('units', {})
+    digits = corrections.get('digits', {})
+
+    lookalikes = ''.join(re.escape(char) for char in digits)
+    # Lower-case look-alikes inside words are too common to start a match on
+    leading = ''.join(re.escape(char) for char in digits if not char.islower())
+    chars = '0-9' + lookalikes
+    typos = _alternation(units) if units else '(?!)'
+    first_letters = ''.join(sorted({re.escape(word[0]) for word in words}))
+
+    # The first character is consumed by the leading class; each alternative checks it afterwards
+    word_alternatives = [
+        f"{re.escape(word[1:])}(?<={re.escape(word)})(?<!\\w.{{{len(word)}}})(?!\\w)"
+        for word in sorted(words, key=len, reverse=True)
+    ]
+    digit_start = f"(?<=[0-9])(?=[0-9.,]*(?:[{lookalikes}]|\\s?(?:{typos})(?![A-Za-z])))" if lookalikes else \
+        f"(?<=[0-9])(?=[0-9.,]*\\s?(?:{typos})(?![A-Za-z]))"
+    lookalike_start = f"|(?<=[{leading}])" if leading else ""
+    # A number ending in a look-alike that is also a unit ("1l") backs off and reads it as the unit
+    unit_names = {unit.lower() for unit in CANONICAL_UNITS}
+    unit_lookalikes = ''.join(re.escape(char) for char in digits if char.lower() in unit_names)
+    unit_ending = f"(?<![{chars}][{unit_lookalikes}])" if unit_lookalikes else ""
+    amount = (
+        f"(?<![A-Za-z0-9.,].)(?:{digit_start}{lookalike_start})"
+        f"[{chars}]*(?:[.,][{chars}]+)*"
+        f"(?:(\\s?)({typos}|(?i:{_alternation(CANONICAL_UNITS)}))(?![A-Za-z])"
+        f"|{unit_ending}(?![A-Za-z0-9{lookalikes}]|[.,][{chars}]))"
+    )
+    pattern = re.compile(f"[0-9{leading}{first_letters}](?:{'|'.join(word_alternatives + [amount])})")
+
+    to_digits = str.maketrans(digits)
+    # A number with every look-alike and separator stripped is empty unless it has a real digit
+    not_digits = ''.join(digits) + '.,'
+    mass_units = set(MASS_UNITS)
+
+    def fix_amount(match, text):
+        space, unit = match.group(1, 2)
+        if unit is None:
+            return text.translate(to_digits) if text.strip(not_digits) else text
+        number = text[:len(text) - len(space) - len(unit)]
+        unit = units.get(unit, unit)
+        # Only a lone look-alike before a mass unit reads as a number ("Og", "Omg")
+        if not number.strip(not_digits) and (len(number) > 1 or unit.lower() not in mass_units):
+            return text
+        return number.translate(to_digits) + space + unit
+
+    # A match's replacement depends only on its text, and labels repeat the same few amounts
+    replacements = dict(words)
+
+    def fix(match):
+        text = match.group()
+        replacement = replacements.get(text)
+        if replacement is None:
+            if len(replacements) >= MAX_CACHED_REPLACEMENTS:
+                replacements.clear()
+                replacements.update(words)
+            replacement = replacements[text] = fix_amount(match, text)
+        return replacement
+
+    def normalize(text):
+        return pattern.sub(fix, text)
+
+    return normalize
+
+
+_normalize = compile_normalizer(load_corrections())
+
+
+def normalize_ocr_text(text):
+    """Apply all OCR corrections to the text"""
+    return _normalize(text)
+
 
 def clean_nutrition_text(text):
     """Clean and validate nutrition label text"""
     if not text:
         return text
-    
+
     # Remove unnecessary whitespace while preserving table structure
     lines = [' '.join(line.split()) for line in text.split('\n')]
     text = '\n'.join(lines)
-    
+
     # Enhanced OCR corrections for nutrition labels
-    replacements = {
-        '|': '1',
-        'O': '0',
-        'g.': 'g',
-        'rng': 'mg',
-        'mq': 'mg',
-        'q': 'g',
-        '%o': '%',
-        'qg': 'g',
-        'mgl': 'mg',
-        'Protein': 'Protein',
-        'Proteln': 'Protein',
-        'Serving Size': 'Serving Size',
-        'Servina Size': 'Serving Size',
-        'Calories': 'Calories',
-        'Calorles': 'Calories',
-        'Total Fat': 'Total Fat',
-        'Cholesterol': 'Cholesterol',
-        'Sodium': 'Sodium',
-        'Sodlum': 'Sodium',
-        'Carbohydrate': 'Carbohydrate',
-        'Carbohvdrate': 'Carbohydrate',
-    }
-    
-    for old, new in replacements.items():
-        text = text.replace(old, new)
-    
+    text = normalize_ocr_text(text)
+
     # Ensure common nutrition terms are present
     nutrition_keywords = [
-        'serving size', 'calories', 'total fat', 'cholesterol', 
+        'serving size', 'calories', 'total fat', 'cholesterol',
         'sodium', 'carbohydrate', 'protein', 'sugar', 'fiber'
     ]
-    found_keywords = sum(1 for keyword in nutrition_keywords if keyword.lower() in text.lower())
-    
+    lowered = text.lower()
+    found_keywords = sum(1 for keyword in nutrition_keywords if keyword in lowered)
+
     # If less than 4 keywords found, text might not be a nutrition label
     if found_keywords < 4:
         logging.warning("Extracted text might not be a nutrition label")
-    
-    return text 
\ No newline at end of file
+
+    return text
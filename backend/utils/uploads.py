@@ -0,0 +1,123 @@
+import io
+import os
+
+from PIL import Image, ImageOps
+from starlette.responses import JSONResponse
+
+# Largest accepted upload; phone photos are 2-8 MB
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(15 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 256 * 1024
+# Room for multipart boundaries and small form fields on top of the file itself
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadTooLargeError(Exception):
+    """Raised while reading an upload that exceeds MAX_UPLOAD_BYTES"""
+
+    def __init__(self, limit):
+        super().__init__(f"Upload is larger than {limit / (1024 * 1024):.1f} MB")
+        self.limit = limit
+
+
+async def read_upload(file, max_bytes=MAX_UPLOAD_BYTES):
+    """Read an UploadFile in chunks, stopping as soon as it exceeds max_bytes"""
+    # Starlette knows the size of the spooled part already; reject without reading it
+    if file.size is not None and file.size > max_bytes:
+        raise UploadTooLargeError(max_bytes)
+
+    buffer = bytearray()
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        buffer += chunk
+        if len(buffer) > max_bytes:
+            raise UploadTooLargeError(max_bytes)
+    await file.close()
+    # Everything downstream takes any bytes-like object; copying to bytes would double the peak
+    return buffer
+
+
+class UploadLimitMiddleware:
+    """Reject request bodies over the upload limit as they arrive, before a form parser spools them
+
+    A declared Content-Length over the limit is refused without reading the
+    body; otherwise the body is counted as it streams in and the request is
+    answered with 413 as soon as the count passes the limit. route_limits
+    maps a path to its own limit, e.g. for batch uploads.
+    """
+
+    def __init__(self, app, max_bytes=MAX_UPLOAD_BYTES, route_limits=None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.route_limits = route_limits or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = self.route_limits.get(scope["path"], self.max_bytes)
+        limit = max_bytes + FORM_OVERHEAD_BYTES
+        declared = dict(scope["headers"]).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > limit:
+            await self._reject(scope, receive, send, max_bytes)
+            return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    raise UploadTooLargeError(max_bytes)
+            return message
+
+        async def tracked_send(message):
+            nonlocal response_started
+            # Once over the limit, whatever the app makes of the cut-off body is replaced by a 413
+            if exceeded and not response_started:
+                return
+            response_started = response_started or message["type"] == "http.response.start"
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except UploadTooLargeError:
+            if not exceeded:
+                raise
+        if exceeded and not response_started:
+            await self._reject(scope, receive, send, max_bytes)
+
+    @staticmethod
+    async def _reject(scope, receive, send, max_bytes):
+        error = UploadTooLargeError(max_bytes)
+        response = JSONResponse(status_code=413, content={"success": False, "error": str(error)})
+        await response(scope, receive, send)
+
+
+def open_image(contents, max_side=None):
+    """Decode an upload as upright grayscale, at no more than the resolution OCR needs
+
+    JPEGs are decoded straight to grayscale and, when much larger than
+    max_side, at 1/2, 1/4 or 1/8 scale by the decoder itself, so the full
+    size RGB image never exists in memory. EXIF orientation is applied once
+    here so later stages see the label upright.
+    """
+    image = Image.open(io.BytesIO(contents))
+    if image.format == 'JPEG':
+        # draft() only picks scales that keep the image at least this size
+        scale = min(1.0, max_side / max(image.size)) if max_side else 1.0
+        image.draft('L', (int(image.size[0] * scale), int(image.size[1] * scale)))
+
+    ImageOps.exif_transpose(image, in_place=True)
+    if image.mode != 'L':
+        # Other formats (and CMYK JPEGs) decode in full, then drop the colour
+        return image.convert('L')
+    image.load()
+    return image
@@ -11,6 +11,7 @@ import {
   Chip,
   TextField,
   Box,
+  Button,
 } from '@mui/material';
 import DeleteIcon from '@mui/icons-material/Delete';
 import FastfoodIcon from '@mui/icons-material/Fastfood';
@@ -18,7 +19,7 @@ import EditIcon from '@mui/icons-material/Edit';
 import CheckIcon from '@mui/icons-material/Check';
 import { format } from 'date-fns';
 
-const History = ({ history, onSelectHistory, onDeleteHistory, onNameEdit }) => {
+const History = ({ history, onSelectHistory, onDeleteHistory, onNameEdit, onLoadMore }) => {
   const [editingIndex, setEditingIndex] = useState(null);
   const [editingName, setEditingName] = useState('');
 
@@ -35,6 +36,10 @@ const History = ({ history, onSelectHistory, onDeleteHistory, onNameEdit }) => {
   };
 
   const getVerdict = (item) => {
+    // Entries loaded from the server carry only the verdict until they are opened
+    if (!item.analysis && item.verdict) {
+      return item.verdict;
+    }
     try {
       const sections = item.analysis.split('\n');
       return sections[0].replace('Verdict:', '').trim();
@@ -145,6 +150,11 @@ const History = ({ history, onSelectHistory, onDeleteHistory, onNameEdit }) => {
           );
         })}
       </List>
+      {onLoadMore && (
+        <Button size="small" onClick={onLoadMore} fullWidth>
+          Load older analyses
+        </Button>
+      )}
     </Paper>
   );
 };
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useCallback } from 'react';
 import { 
   Container, 
   Box, 
@@ -26,7 +26,7 @@ import ImageUpload from '../components/ImageUpload';
 import AnalysisResult from '../components/AnalysisResult';
 import History from '../components/History';
 import LoadingSpinner from '../components/LoadingSpinner';
-import { analyzeImage } from '../services/api';
+import { analyzeImage, fetchHistory, fetchResult } from '../services/api';
 import RestaurantIcon from '@mui/icons-material/Restaurant';
 import UserProfileForm from '../components/UserProfileForm';
 import AccountCircleIcon from '@mui/icons-material/AccountCircle';
@@ -39,6 +39,17 @@ import PhotoCameraIcon from '@mui/icons-material/PhotoCamera';
 import PsychologyIcon from '@mui/icons-material/Psychology';
 import InsightsIcon from '@mui/icons-material/Insights';
 
+// A history summary from the server, shaped like the entries kept in localStorage
+const fromServerHistory = (item) => ({
+  result_id: item.id,
+  productName: 'Saved analysis',
+  timestamp: new Date(item.created_at * 1000).toISOString(),
+  verdict: item.verdict,
+});
+
+// Server results the user deleted from the list, so they are not merged back in
+const getHiddenResults = () => JSON.parse(localStorage.getItem('hiddenResults') || '[]');
+
 const Home = () => {
   const [analysis, setAnalysis] = useState(null);
   const [loading, setLoading] = useState(false);
@@ -56,6 +67,7 @@ const Home = () => {
   const [tempImage, setTempImage] = useState(null);
   const [newFoodName, setNewFoodName] = useState('');
   const [showAnalysis, setShowAnalysis] = useState(false);
+  const [historyCursor, setHistoryCursor] = useState(null);
 
   const theme = useTheme();
   const isMobile = useMediaQuery(theme.breakpoints.down('sm'));
@@ -67,6 +79,29 @@ const Home = () => {
     }
   }, [history, userProfile]);
 
+  // Add analyses stored on the server (e.g. made on another device) that are not listed yet
+  const loadServerHistory = useCallback(async (before = null) => {
+    try {
+      const { items, nextBefore } = await fetchHistory({ before });
+      const hidden = getHiddenResults();
+      setHistory(prev => {
+        const known = new Set(prev.map(item => item.result_id).filter(Boolean));
+        const added = items
+          .filter(item => !known.has(item.id) && !hidden.includes(item.id))
+          .map(fromServerHistory);
+        return [...prev, ...added].sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp));
+      });
+      setHistoryCursor(nextBefore);
+    } catch (err) {
+      // History is optional on the server; the local list still works without it
+      setHistoryCursor(null);
+    }
+  }, []);
+
+  useEffect(() => {
+    loadServerHistory();
+  }, [loadServerHistory]);
+
   const handleProfileSubmit = (profile) => {
     setUserProfile(profile);
     setShowProfileForm(false);
@@ -101,11 +136,36 @@ const Home = () => {
     }
   };
 
-  const handleSelectHistory = (item) => {
-    setAnalysis(item);
+  const handleSelectHistory = async (item) => {
+    if (item.analysis || !item.result_id) {
+      setAnalysis(item);
+      return;
+    }
+    // Entries loaded from the server are summaries; fetch the full result once
+    setLoading(true);
+    setError(null);
+    try {
+      const result = await fetchResult(item.result_id);
+      const fullItem = {
+        ...item,
+        success: true,
+        extracted_text: result.extracted_text,
+        analysis: result.analysis,
+      };
+      setAnalysis(fullItem);
+      setHistory(prev => prev.map(entry => (entry.result_id === item.result_id ? fullItem : entry)));
+    } catch (err) {
+      setError(err.message);
+    } finally {
+      setLoading(false);
+    }
   };
 
   const handleDeleteHistory = (index) => {
+    const resultId = history[index].result_id;
+    if (resultId) {
+      localStorage.setItem('hiddenResults', JSON.stringify([...getHiddenResults(), resultId]));
+    }
     setHistory(prev => prev.filter((_, i) => i !== index));
   };
 
@@ -523,6 +583,7 @@ const Home = () => {
                 onSelectHistory={handleSelectHistory}
                 onDeleteHistory={handleDeleteHistory}
                 onNameEdit={handleNameEdit}
+                onLoadMore={historyCursor ? () => loadServerHistory(historyCursor) : null}
               />
               <ImageUpload onImageSelect={handleImageSelect} />
             </Box>
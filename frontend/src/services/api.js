@@ -2,6 +2,17 @@ import axios from 'axios';
 
 const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
 
+// Random key that scopes server-side history to this browser. Copy it to
+// another device's localStorage to see the same history there.
+const getClientKey = () => {
+  let key = localStorage.getItem('clientKey');
+  if (!key) {
+    key = crypto.randomUUID();
+    localStorage.setItem('clientKey', key);
+  }
+  return key;
+};
+
 export const analyzeImage = async (imageFile, healthProfile = null) => {
   const formData = new FormData();
   formData.append('file', imageFile);
@@ -10,6 +21,7 @@ export const analyzeImage = async (imageFile, healthProfile = null) => {
     const response = await axios.post(`${API_URL}/analyze-label`, formData, {
       headers: {
         'Content-Type': 'multipart/form-data',
+        'X-Client-Key': getClientKey(),
       },
       data: { health_profile: healthProfile }
     });
@@ -17,4 +29,29 @@ export const analyzeImage = async (imageFile, healthProfile = null) => {
   } catch (error) {
     throw new Error(error.response?.data?.error || 'Failed to analyze image');
   }
-}; 
\ No newline at end of file
+}; 
+
+// Past analyses stored on the server, newest first. Pass the returned
+// nextBefore back in to load the next page; it is null on the last page.
+export const fetchHistory = async ({ before = null, limit = 20 } = {}) => {
+  try {
+    const response = await axios.get(`${API_URL}/history`, {
+      params: { limit, ...(before !== null && { before }) },
+      headers: { 'X-Client-Key': getClientKey() },
+    });
+    return { items: response.data.items, nextBefore: response.data.next_before };
+  } catch (error) {
+    throw new Error(error.response?.data?.error || 'Failed to load history');
+  }
+};
+
+export const fetchResult = async (resultId) => {
+  try {
+    const response = await axios.get(`${API_URL}/results/${resultId}`, {
+      headers: { 'X-Client-Key': getClientKey() },
+    });
+    return response.data;
+  } catch (error) {
+    throw new Error(error.response?.data?.error || 'Failed to load result');
+  }
+};